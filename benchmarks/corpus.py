@@ -0,0 +1,111 @@
+"""This module generates synthetic LaTeX documents to benchmark with."""
+
+import random
+
+WORDS = """the of and to in is that for it as was with be by on not he this are
+or his from at which but have an they you were her she there been one all we
+their has would when if so no its more out up said what some can into only
+other new time could them two than first may then do any like these over
+such our man me even most made after also did many before must through years
+where much your way well down should because each just those people how too
+little state good very make world still own see men work long get here
+between both life being under never day same another know while last might us
+great old year off come since against go came right used take three method
+results model data analysis system function theorem proof equation value
+""".split()
+
+UNITS = ['m', 'kg', 's', 'K', 'mol', 'cd', 'A']
+
+MATH = [r'x^2 + y^2 = z^2', r'\sum_{i=1}^{n} a_i', r'\int_0^1 f(x)\,dx',
+        r'\alpha + \beta', r'\frac{a}{b}', r'\sin^2 x + \cos^2 x = 1',
+        r'\mathbb{E}[X] = \mu', r'A \subseteq B', r'<a, b>', r'max(x, y)']
+
+# Relative weights of the kinds of sentences making up each mix
+MIXES = {
+    'prose': {'prose': 10, 'mistake': 2, 'math': 1, 'cite': 1},
+    'math': {'prose': 3, 'mistake': 1, 'math': 6, 'cite': 1},
+    'citation': {'prose': 4, 'mistake': 1, 'math': 1, 'cite': 8},
+    'long-lines': {'prose': 10, 'mistake': 2, 'math': 2, 'cite': 2},
+}
+
+# Chance of a line being followed by a displayed equation in each mix
+DISPLAY_CHANCE = {'prose': 0.02, 'math': 0.3, 'citation': 0.02,
+                  'long-lines': 0.02}
+
+# Length of the lines in each mix
+LINE_LENGTH = {'prose': 72, 'math': 72, 'citation': 72, 'long-lines': 5000}
+
+
+class CorpusGenerator(object):
+    """Generate deterministic synthetic LaTeX documents.
+
+    Parameters
+    ----------
+    mix : string
+        The kind of document to generate, one of the keys of `MIXES`.
+    seed : int, optional
+        The seed of the random number generator, so that the same document is
+        generated every time.
+    """
+
+    def __init__(self, mix, seed=0):
+        self.mix = mix
+        self.random = random.Random(seed)
+
+        weights = MIXES[mix]
+        self.kinds = [k for k in sorted(weights) for _ in range(weights[k])]
+
+    def words(self, count):
+        return ' '.join(self.random.choice(WORDS) for _ in range(count))
+
+    def sentence(self):
+        """Return a sentence, which may contain mistakes."""
+        kind = self.random.choice(self.kinds)
+        text = self.words(self.random.randint(6, 18)).capitalize()
+
+        if kind == 'math':
+            return '{0} ${1}$ {2}.'.format(text, self.random.choice(MATH),
+                                           self.words(4))
+        elif kind == 'cite':
+            return '{0}~\\cite{{ref{1}}} {2} \\ref{{fig{3}}}.'.format(
+                text, self.random.randint(1, 99), self.words(3),
+                self.random.randint(1, 9))
+        elif kind == 'mistake':
+            mistake = self.random.choice([
+                'the the', '15%', 'e.g. this', '10x10', '1st', '...',
+                'pages 1-2', '"quoted"', '14.5{0}'.format(
+                    self.random.choice(UNITS)),
+                'http://example.com/page', '\\cite{a}\\cite{b}'])
+            return '{0} {1} {2}.'.format(text, mistake, self.words(3))
+        return text + '.'
+
+    def lines(self, num_lines):
+        """Generate the lines of a document with about `num_lines` lines."""
+        yield '\\documentclass{article}\n'
+        yield '\\begin{document}\n'
+
+        count = 2
+        while count < num_lines - 1:
+            # Fill a line with sentences
+            line = ''
+            while len(line) < LINE_LENGTH[self.mix]:
+                line += self.sentence() + ' '
+            yield line.rstrip() + '\n'
+            count += 1
+
+            if self.random.random() < DISPLAY_CHANCE[self.mix]:
+                yield '\\begin{equation}\n'
+                for _ in range(self.random.randint(1, 3)):
+                    yield '  {0} \\\\\n'.format(self.random.choice(MATH))
+                    count += 1
+                yield '\\end{equation}\n'
+                count += 2
+            elif self.random.random() < 0.1:
+                yield '\n'
+                count += 1
+
+        yield '\\end{document}\n'
+
+    def document(self, num_lines):
+        """Generate a document as a string."""
+        return ''.join(self.lines(num_lines))
@@ -0,0 +1,183 @@
+"""Benchmark draftcheck on synthetic documents and check for regressions.
+
+Run from the root of the repository:
+
+    python -m benchmarks.run --output results.json --baseline baseline.json
+
+The results are written as JSON, mapping the name of each measurement to
+the best time in seconds out of several repetitions. When a baseline is
+given, any measurement slower than the baseline by more than the threshold
+is reported and the exit status is non-zero.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import MIXES, CorpusGenerator
+from draftcheck import rules
+from draftcheck.validator import Validator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def best_time(func, repeat):
+    """Return the shortest time out of `repeat` calls of `func`."""
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def validate_all(lines, **kwargs):
+    validator = Validator(**kwargs)
+    for line in lines:
+        for _ in validator.validate(line):
+            pass
+
+
+def chunks(lines):
+    """Return the (chunk, env) pairs that the rules are run on for lines."""
+    result = []
+    validator = Validator()
+    for line in lines:
+        for _ in validator.validate(line):
+            pass
+
+        env = validator.envs[-1]
+        if env == 'math':
+            result.append((line, 'math'))
+        else:
+            parts = Validator.math_env_regex.split(line)
+            result.extend(zip(parts, [env, 'math'] * len(parts)))
+    return result
+
+
+def bench_validate(sizes, repeat):
+    """Time validating each mix of documents, end to end."""
+    results = {}
+    for mix in sorted(MIXES):
+        for size in sizes:
+            lines = list(CorpusGenerator(mix).lines(size))
+            for name, kwargs in [('', {}),
+                                 ('single-pass:', {'single_pass': True}),
+                                 ('lexer:', {'lexer': True})]:
+                key = 'validate:{0}{1}:{2}'.format(name, mix, size)
+                results[key] = best_time(
+                    lambda: validate_all(lines, **kwargs), repeat)
+    return results
+
+
+def bench_rules(size, repeat):
+    """Time each rule on its own over the chunks of every mix."""
+    pairs = []
+    for mix in sorted(MIXES):
+        pairs.extend(chunks(CorpusGenerator(mix).lines(size)))
+
+    results = {}
+    for r in rules.RULES_LIST:
+        def run():
+            for chunk, env in pairs:
+                r(chunk, env)
+        results['rule:{0:03d}'.format(r.id)] = best_time(run, repeat)
+    return results
+
+
+def bench_startup(repeat):
+    """Time running the command line tool on an empty file."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    command = [sys.executable, os.path.join(ROOT, 'bin', 'draftcheck'),
+               '--no-cache']
+
+    with tempfile.NamedTemporaryFile(suffix='.tex') as empty:
+        with open(os.devnull, 'w') as devnull:
+            return {'startup': best_time(
+                lambda: subprocess.call(command + [empty.name], env=env,
+                                        stdout=devnull), repeat)}
+
+
+def compare(results, baseline, threshold, min_time):
+    """Compare results against a baseline.
+
+    Returns
+    -------
+    regressions, new : list of string
+        Descriptions of the measurements slower than the baseline by more than
+        `threshold` (as a fraction), ignoring those taking less than
+        `min_time` seconds, and of those missing from the baseline.
+    """
+    regressions = []
+    new = []
+    for key in sorted(results):
+        if key not in baseline:
+            new.append('{0}: {1:.4f}s'.format(key, results[key]))
+        elif (results[key] >= min_time and
+              results[key] > baseline[key] * (1 + threshold)):
+            regressions.append('{0}: {1:.4f}s, baseline {2:.4f}s ({3:+.0%})'
+                               .format(key, results[key], baseline[key],
+                                       results[key] / baseline[key] - 1))
+    return regressions, new
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 2000],
+                        help='Numbers of lines of the generated documents')
+    parser.add_argument('--rule-size', type=int, default=500,
+                        help='Number of lines of each mix used to time rules')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of repetitions of each measurement')
+    parser.add_argument('--output', default='bench_output.json',
+                        help='File to write the results to')
+    parser.add_argument('--baseline',
+                        help='Results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Fraction by which a measurement may be slower '
+                             'than the baseline')
+    parser.add_argument('--min-time', type=float, default=0.001,
+                        help='Measurements faster than this many seconds are '
+                             'never regressions')
+
+    args = parser.parse_args()
+
+    results = {}
+    results.update(bench_validate(args.sizes, args.repeat))
+    results.update(bench_rules(args.rule_size, args.repeat))
+    results.update(bench_startup(args.repeat))
+
+    with open(args.output, 'w') as outfile:
+        json.dump(results, outfile, indent=2, sort_keys=True)
+
+    for key in sorted(results):
+        print '{0:40} {1:.4f}s'.format(key, results[key])
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as infile:
+        baseline = json.load(infile)
+    regressions, new = compare(results, baseline, args.threshold,
+                               args.min_time)
+
+    if new:
+        print '\nNot in the baseline:'
+        for line in new:
+            print '  ' + line
+
+    if regressions:
+        print '\nRegressions:'
+        for line in regressions:
+            print '  ' + line
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""This module contains code to check the files in source archives.
+
+Archives such as `paper.tar.gz` or `paper.zip` are read as they are
+decompressed, without extracting them: each `.tex` member is validated from
+the decompression stream, and reported as `archive!member`.
+"""
+
+from validator import Validator
+
+# The extensions of the archives which can be read
+ARCHIVE_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.zip')
+
+
+def is_archive(fname):
+    """Return whether a file is an archive, judging from its name."""
+    return fname.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def iter_members(fname, extensions=('.tex',)):
+    """Yield the regular files in an archive as they are decompressed.
+
+    Tar archives are read as a stream, so each member has to be read before
+    the next one is yielded.
+
+    Yields
+    ------
+    name, stream : (string, file)
+        The name of each member with one of the extensions, and a file-like
+        object reading it.
+    """
+    if fname.lower().endswith('.zip'):
+        import zipfile
+
+        with zipfile.ZipFile(fname) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                if isinstance(name, unicode):
+                    name = name.encode('utf-8')
+                if name.endswith(extensions):
+                    yield name, archive.open(info)
+        return
+
+    import tarfile
+
+    with tarfile.open(fname, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and member.name.endswith(extensions):
+                yield member.name, archive.extractfile(member)
+
+
+def check_archive(fname, whole_document=False, cache=None, sink=list,
+                  **kwargs):
+    """Find the violations in the `.tex` files of an archive.
+
+    Each member is checked as `script.check_file` would check it once
+    extracted, with the same `sink`. Other keyword arguments are passed on to
+    `Validator`, and the cache is not used.
+
+    Returns
+    -------
+    members : list of (name, violations)
+        The name of each member, as `archive!member`, and the records of the
+        violations in it, or what `sink` returns for them.
+    """
+    from script import check_document, check_lines
+
+    members = []
+    for name, stream in iter_members(fname):
+        validator = Validator(**kwargs)
+        if whole_document:
+            violations = check_document(stream.read(), validator, sink)
+        else:
+            violations = check_lines(stream, validator, sink=sink)
+        members.append(('{0}!{1}'.format(fname, name), violations))
+    return members
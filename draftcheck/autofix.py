@@ -0,0 +1,111 @@
+"""This module contains code to fix violations of rules mechanically."""
+
+import os
+import tempfile
+
+from cStringIO import StringIO
+
+from validator import Validator
+
+
+def find_edits(lines, validator, resume=None):
+    """Find the edits fixing the violations in an iterable of lines.
+
+    Only rules given a `fix` are fixed. See `script.check_lines` for
+    `resume`.
+
+    Returns
+    -------
+    edits : list of (start, end, replacement)
+        The offsets in the text made of the lines of each substring to
+        replace, and what to replace it with, in the order they were found.
+    violations : list of (lineno, line, span, rule_id)
+        All the violations found, as `script.check_lines` returns them.
+    """
+    edits = []
+    violations = []
+    offset = 0
+    for lineno, line in enumerate(lines):
+        for rule, span in validator.validate(line):
+            violations.append((lineno, line.strip(), span, rule.id))
+            fix = getattr(rule, 'fix', None)
+            if fix is None:
+                continue
+            replacement = fix(line[span[0]:span[1]], line[:span[0]])
+            if replacement is not None:
+                edits.append((offset + span[0], offset + span[1], replacement))
+        if resume and lineno in resume:
+            validator.reset(resume[lineno])
+        offset += len(line)
+    return edits, violations
+
+
+def apply_edits(text, edits):
+    """Apply edits to text in a single pass.
+
+    Edits overlapping an edit starting before them, or starting at the same
+    offset but longer, are left out, as they would have to be found again in
+    the edited text.
+
+    Returns
+    -------
+    text : string
+        The edited text.
+    count : int
+        The number of edits applied.
+    """
+    parts = []
+    position = 0
+    count = 0
+    for start, end, replacement in sorted(edits):
+        if start < position:
+            continue
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+        count += 1
+    parts.append(text[position:])
+    return ''.join(parts), count
+
+
+def write_atomically(fname, text):
+    """Replace the contents of a file, so that it is never half written."""
+    directory = os.path.dirname(os.path.abspath(fname))
+    fd, tmpname = tempfile.mkstemp(dir=directory, prefix='.draftcheck')
+    try:
+        with os.fdopen(fd, 'wb') as outfile:
+            outfile.write(text)
+        os.chmod(tmpname, os.stat(fname).st_mode & 0o7777)
+        os.rename(tmpname, fname)
+    except BaseException:
+        os.remove(tmpname)
+        raise
+
+
+def fix_file(fname, resume=None, cache=None, **kwargs):
+    """Fix the violations in a file that can be fixed, in place.
+
+    Keyword arguments are passed on to `Validator`, and the cache is not used.
+    Files with any fixes are checked again once fixed, to report the
+    violations left.
+
+    Returns
+    -------
+    count : int
+        The number of violations fixed.
+    violations : list of (lineno, line, span, rule_id)
+        The violations left in the file, as `script.check_file` returns them.
+    """
+    from script import check_lines
+
+    with open(fname, 'rb') as infile:
+        content = infile.read()
+
+    edits, violations = find_edits(StringIO(content), Validator(**kwargs),
+                                   resume)
+    if not edits:
+        return 0, violations
+
+    content, count = apply_edits(content, edits)
+    write_atomically(fname, content)
+    return count, check_lines(StringIO(content), Validator(**kwargs), resume)
@@ -0,0 +1,115 @@
+"""This module contains code to check many short documents at once.
+
+Rather than a tuple per violation, the violations found are stored column by
+column in arrays of machine integers, which take a few bytes per violation
+and can be handed to other libraries without copying, for example with
+`numpy.frombuffer(violations.start, dtype=numpy.int64)`.
+"""
+
+import array
+import itertools
+
+from rules import RULES_LIST
+from validator import Validator
+
+
+class Violations(object):
+    """Violations in many documents, stored column by column.
+
+    Attributes
+    ----------
+    document : array.array
+        The index of the document each violation is in.
+    rule : array.array
+        The id of the rule violated.
+    start, end : array.array
+        The offsets of the substring violating the rule in the document.
+    """
+
+    def __init__(self):
+        self.document = array.array('l')
+        self.rule = array.array('h')
+        self.start = array.array('l')
+        self.end = array.array('l')
+
+    def __len__(self):
+        return len(self.document)
+
+    def __iter__(self):
+        """Iterate over (document, rule_id, start, end) rows."""
+        return itertools.izip(self.document, self.rule, self.start, self.end)
+
+    def rule_counts(self):
+        """Return the number of violations of each rule, indexed by id."""
+        counts = array.array('l', [0]) * (len(RULES_LIST) + 1)
+        for rule_id in self.rule:
+            counts[rule_id] += 1
+        return counts
+
+    def document_counts(self, num_documents):
+        """Return the number of violations in each document."""
+        counts = array.array('l', [0]) * num_documents
+        for index in self.document:
+            counts[index] += 1
+        return counts
+
+
+def validate_many(texts, envs=None, counts_only=False, single_pass=True,
+                  **kwargs):
+    """Check many documents, such as paragraphs, with a single validator.
+
+    Each document is validated as a whole, as by `Validator.validate_document`,
+    starting from the same environment stack. Unicode documents are encoded
+    as UTF-8 first, so offsets always count bytes.
+
+    Parameters
+    ----------
+    texts : iterable of string
+        The documents to check.
+    envs : sequence of string, optional
+        The environment stack each document starts in, such as `('math',)`
+        for equations. Defaults to the top level of a document.
+    counts_only : boolean, optional
+        Whether to only count the violations of each rule rather than record
+        where they are.
+    single_pass : boolean, optional
+        Whether to check all the rules at once, see `Validator`. Defaults to
+        true, as the combined matchers are shared by all the documents.
+
+    Other keyword arguments are passed on to `Validator`.
+
+    Returns
+    -------
+    violations : Violations or array.array
+        The violations found, or if `counts_only` is set the number of
+        violations of each rule, indexed by rule id.
+    """
+    validator = Validator(single_pass=single_pass, envs=envs, **kwargs)
+    initial = validator.envs
+
+    if counts_only:
+        counts = array.array('l', [0]) * (len(RULES_LIST) + 1)
+    else:
+        violations = Violations()
+        add_document = violations.document.append
+        add_rule = violations.rule.append
+        add_start = violations.start.append
+        add_end = violations.end.append
+
+    for index, text in enumerate(texts):
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        validator.reset(initial)
+
+        if counts_only:
+            for rule, span in validator.validate_document(text):
+                counts[rule.id] += 1
+            continue
+
+        for rule, (start, end) in validator.validate_document(text):
+            add_document(index)
+            add_rule(rule.id)
+            add_start(start)
+            add_end(end)
+
+    return counts if counts_only else violations
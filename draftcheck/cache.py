@@ -0,0 +1,145 @@
+"""This module contains a persistent cache of the violations found in files."""
+
+import errno
+import hashlib
+import os
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import rules
+from draftcheck import __version__
+
+# Rulesets fingerprinted so far, keyed by the version of the dispatch table
+_fingerprints = {}
+
+
+def default_cache_dir():
+    """Return the directory the cache is kept in unless told otherwise."""
+    base = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'draftcheck')
+
+
+def fingerprint():
+    """Return a digest identifying the selected rules.
+
+    The digest covers the id, pattern, environment and code of every selected
+    rule in `rules.RULES_LIST`, as well as the version of draftcheck, so that
+    results found with a different ruleset are never reused.
+    """
+    if rules.VERSION not in _fingerprints:
+        digest = hashlib.sha1(__version__)
+        for r in rules.RULES_LIST:
+            if not rules.is_selected(r):
+                continue
+            digest.update(repr((r.id, r.pattern, r.in_env, r.show_spaces)))
+            digest.update(r.func.__code__.co_code)
+        _fingerprints[rules.VERSION] = digest.hexdigest()
+    return _fingerprints[rules.VERSION]
+
+
+class Cache(object):
+    """A directory mapping file contents to the violations found in them.
+
+    Each entry is stored in its own file, named after a digest of the
+    contents of the checked file, the ruleset fingerprint and the options used
+    to check it. Entries are written to a temporary file and renamed into
+    place, so concurrent processes sharing the directory never see partially
+    written entries. Once the entries exceed `max_size` bytes in total, the
+    least recently used ones are evicted by `prune`.
+
+    Parameters
+    ----------
+    path : string, optional
+        The cache directory, which is created when needed. Defaults to
+        `default_cache_dir()`.
+    max_size : int, optional
+        The number of bytes the entries may take up. Defaults to 64 MiB.
+    """
+
+    def __init__(self, path=None, max_size=64 << 20):
+        self.path = path or default_cache_dir()
+        self.max_size = max_size
+
+    def key(self, content, *options):
+        """Return the key of the entry for some file contents and options."""
+        digest = hashlib.sha1(fingerprint())
+        digest.update(repr(options))
+        digest.update(content)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the violations stored under `key`, or None if missing."""
+        fname = os.path.join(self.path, key)
+        try:
+            with open(fname, 'rb') as infile:
+                violations = pickle.load(infile)
+        except (IOError, OSError, EOFError, ValueError, pickle.PickleError):
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(fname, None)
+        except OSError:
+            pass
+        return violations
+
+    def put(self, key, violations):
+        """Store violations under `key`. Failing to do so is not an error."""
+        # Only needed when writing, and slow to import
+        import tempfile
+
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                return
+
+        try:
+            fd, tmpname = tempfile.mkstemp(dir=self.path, prefix='.tmp')
+        except (IOError, OSError):
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as outfile:
+                pickle.dump(violations, outfile, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmpname, os.path.join(self.path, key))
+        except (IOError, OSError):
+            try:
+                os.remove(tmpname)
+            except OSError:
+                pass
+
+    def prune(self):
+        """Evict the least recently used entries until under `max_size`."""
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+
+        entries = []
+        total = 0
+        for name in names:
+            if name.startswith('.tmp'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except OSError:
+                # Evicted by another process in the meantime
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+            total -= size
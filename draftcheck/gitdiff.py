@@ -0,0 +1,143 @@
+"""This module contains code to check only the lines changed since a commit."""
+
+import collections
+import os
+import re
+import subprocess
+
+from validator import LineIndex, Validator
+
+# The header of a hunk, giving the lines it covers in the new file
+hunk_regex = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+class GitError(Exception):
+    pass
+
+
+def run_git(args, cwd=None):
+    """Run git with some arguments, returning its output."""
+    process = subprocess.Popen(('git',) + tuple(args), cwd=cwd,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    if process.returncode != 0:
+        raise GitError(err.strip() or 'git {0} failed'.format(args[0]))
+    return out
+
+
+def unquote_path(name):
+    """Return a path as it is, given as git writes it in a diff header.
+
+    Paths with spaces are followed by a tab, and paths with special
+    characters are quoted, with C escapes.
+    """
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1].decode('string_escape')
+    return name.rstrip('\t')
+
+
+def parse_diff(text):
+    """Find the lines added or changed in each file of a unified diff.
+
+    Returns
+    -------
+    ranges : OrderedDict
+        Maps the path of each file, as given in the diff, to a sorted list of
+        (first, stop) ranges of line numbers, counting from 0, of the lines
+        of the new file that were added or changed. Adjacent ranges are
+        merged, and deleted files are left out.
+    """
+    ranges = collections.OrderedDict()
+    path = None
+    for line in text.splitlines():
+        if line.startswith('+++ '):
+            name = unquote_path(line[4:])
+            path = name[2:] if name.startswith('b/') else None
+        elif path is not None and line.startswith('@@'):
+            match = hunk_regex.match(line)
+            if match is None:
+                continue
+            first = int(match.group(1)) - 1
+            count = int(match.group(2) or 1)
+            if count == 0:
+                continue
+
+            file_ranges = ranges.setdefault(path, [])
+            if file_ranges and file_ranges[-1][1] >= first:
+                file_ranges[-1] = (file_ranges[-1][0], first + count)
+            else:
+                file_ranges.append((first, first + count))
+    return ranges
+
+
+def changed_ranges(base, paths=(), extensions=('.tex',)):
+    """Find the lines changed in the working tree since a git revision.
+
+    Parameters
+    ----------
+    base : string
+        The revision to compare against, such as a branch name.
+    paths : list of string, optional
+        The files to look at. Defaults to every file.
+    extensions : tuple of string, optional
+        The extensions of the files to look at.
+
+    Returns
+    -------
+    ranges : OrderedDict
+        Maps the path of each file changed, relative to the current directory,
+        to the ranges of line numbers changed, as `parse_diff` returns them.
+    """
+    top = run_git(['rev-parse', '--show-toplevel']).strip()
+    diff = run_git(['-c', 'core.quotepath=off', 'diff', '--unified=0',
+                    '--no-color', '--no-ext-diff', base, '--'] + list(paths))
+
+    ranges = collections.OrderedDict()
+    for path, file_ranges in parse_diff(diff).items():
+        if path.endswith(extensions):
+            ranges[os.path.relpath(os.path.join(top, path))] = file_ranges
+    return ranges
+
+
+def check_ranges(fname, ranges, cache=None, **kwargs):
+    """Find the violations on some of the lines of a file.
+
+    The environment stack at the start of each range is found by following
+    the environments up to it without checking any rules, see
+    `Validator.track`. Keyword arguments are passed on to `Validator`, and
+    the cache is not used.
+
+    Parameters
+    ----------
+    fname : string
+        The name of the file to check.
+    ranges : list of (first, stop)
+        The sorted ranges of line numbers to check, counting from 0.
+
+    Returns
+    -------
+    violations : list of (lineno, line, span, rule_id)
+        The records `script.check_file` returns for the lines in the ranges.
+    """
+    with open(fname, 'r') as infile:
+        text = infile.read()
+
+    index = LineIndex(text)
+    num_lines = len(index.starts)
+    validator = Validator(**kwargs)
+
+    violations = []
+    position = 0
+    for first, stop in ranges:
+        stop = min(stop, num_lines)
+        if first >= stop:
+            continue
+
+        validator.track(text, position, index.starts[first])
+        for lineno in range(first, stop):
+            start, end = index.line_span(lineno)
+            line = text[start:end]
+            for rule, span in validator.validate(line):
+                violations.append((lineno, line.strip(), span, rule.id))
+        position = index.line_span(stop - 1)[1]
+    return violations
@@ -0,0 +1,215 @@
+"""This module contains code to find and guard against slow rule patterns.
+
+Some patterns take time growing faster than linearly with the length of the
+text they are run on, typically because of an unbounded repeat followed by
+more of the pattern, or because of a backreference. `audit` measures how each
+rule scales on pathological inputs, while `guarded_rules_for_env` lists the
+rules that are safe to run on chunks of text too long for the others, and
+`windowed_rules_for_env` those that are found exactly in windows of long
+lines.
+"""
+
+import math
+import sre_constants
+import sre_parse
+
+import rules
+
+# Rules which are safe to run on long text, keyed by environment
+_guarded = {}
+
+# Rules whose matches are no longer than an overlap, keyed by environment
+# and overlap
+_windowed = {}
+
+# Ops of repeated items in parsed patterns
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+
+def _is_risky(parsed, last):
+    """Return whether a parsed (sub)pattern may backtrack super-linearly."""
+    items = list(parsed)
+    for i, (op, av) in enumerate(items):
+        is_last = last and i == len(items) - 1
+        if op == sre_constants.GROUPREF:
+            return True
+        elif op in _REPEATS:
+            low, high, item = av
+            if high == sre_constants.MAXREPEAT and not is_last:
+                return True
+            if _is_risky(item, is_last):
+                return True
+        elif op == sre_constants.SUBPATTERN:
+            if _is_risky(av[-1], is_last):
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if _is_risky(av[1], False):
+                return True
+        elif op == sre_constants.BRANCH:
+            if any(_is_risky(branch, is_last) for branch in av[1]):
+                return True
+    return False
+
+
+def is_risky(pattern):
+    """Return whether a pattern may take super-linear time to match.
+
+    This is a conservative, static check: it flags patterns with
+    backreferences or with unbounded repeats followed by more of the pattern.
+    When the rest of the pattern fails to match, such a repeat is retried
+    from every position within a long run of the repeated item.
+    """
+    return _is_risky(sre_parse.parse(pattern), True)
+
+
+def guarded_rules_for_env(env):
+    """Return the rules that apply in `env` and are safe on long text."""
+    applicable = rules.rules_for_env(env)
+    key = (env, rules.VERSION)
+    if key not in _guarded:
+        _guarded[key] = [r for r in applicable
+                         if not is_risky(r.pattern)]
+    return _guarded[key]
+
+
+def max_width(pattern):
+    """Return the length of the longest match of a pattern.
+
+    Patterns with unbounded repeats have a width of `sre_constants.MAXREPEAT`
+    or more.
+    """
+    return sre_parse.parse(pattern).getwidth()[1]
+
+
+def windowed_rules_for_env(env, overlap):
+    """Return the rules that apply in `env` and only have short matches.
+
+    Windows of long lines see `overlap` characters on either side, so rules
+    whose matches are no longer than that find the same violations in
+    windows as on the whole line. As their
+    matches are bounded, they also take linear time.
+    """
+    applicable = rules.rules_for_env(env)
+    key = (env, overlap, rules.VERSION)
+    if key not in _windowed:
+        _windowed[key] = [r for r in applicable
+                          if max_width(r.pattern) <= overlap]
+    return _windowed[key]
+
+
+def _sample(parsed):
+    """Return a short string resembling a match of a parsed pattern."""
+    groups = {}
+    result = []
+    for op, av in parsed:
+        if op == sre_constants.LITERAL:
+            result.append(unichr(av) if av > 127 else chr(av))
+        elif op == sre_constants.NOT_LITERAL or op == sre_constants.ANY:
+            result.append('a')
+        elif op == sre_constants.IN:
+            result.append(_sample_in(av))
+        elif op in _REPEATS:
+            result.append(_sample(av[2]) * max(av[0], 1))
+        elif op == sre_constants.SUBPATTERN:
+            text = _sample(av[-1])
+            groups[av[0]] = text
+            result.append(text)
+        elif op == sre_constants.BRANCH:
+            result.append(_sample(av[1][0]))
+        elif op == sre_constants.GROUPREF:
+            result.append(groups.get(av, 'a'))
+    return ''.join(result)
+
+
+def _sample_in(items):
+    if items[0][0] == sre_constants.NEGATE:
+        return 'a'
+    op, av = items[0]
+    if op == sre_constants.LITERAL:
+        return chr(av)
+    elif op == sre_constants.RANGE:
+        return chr(av[0])
+    elif av == sre_constants.CATEGORY_DIGIT:
+        return '1'
+    elif av == sre_constants.CATEGORY_SPACE:
+        return ' '
+    return 'a'
+
+
+def pathological_inputs(pattern, size):
+    """Return inputs of about `size` characters likely to be slow to match.
+
+    The inputs repeat a string resembling a match of the pattern, or its
+    prefix, with filler characters which keep the pattern from completing.
+    """
+    sample = _sample(sre_parse.parse(pattern)) or 'a'
+    prefix = sample[:max(1, len(sample) // 2)]
+
+    inputs = {}
+    for name, unit in [('match', sample), ('prefix', prefix),
+                       ('prefix-space', prefix + ' '), ('letters', 'a'),
+                       ('spaces', ' '), ('words', 'ab ')]:
+        inputs[name] = unit * max(1, size // len(unit))
+    inputs['prefix-tail'] = prefix + 'a' * size
+    inputs['prefix-tail-space'] = prefix + 'a ' * (size // 2)
+    return inputs
+
+
+def _time(func, text):
+    import timeit
+
+    start = timeit.default_timer()
+    func(text)
+    return timeit.default_timer() - start
+
+
+def audit(sizes=(1000, 4000), min_time=0.001, max_exponent=1.5):
+    """Fuzz every rule with pathological inputs, looking for slow patterns.
+
+    Each rule, as well as the pattern used by `Validator` to find inline
+    maths, is run on every input from `pathological_inputs` at each size.
+    The growth of the time taken between the smallest and the largest size
+    gives an estimate of the exponent of the complexity.
+
+    Returns
+    -------
+    report : list of (name, input, exponent, seconds)
+        For every pattern and input taking over `min_time` seconds at the
+        largest size with an estimated exponent over `max_exponent`, the
+        name of the rule, the kind of input, the exponent and the time, the
+        worst first.
+    """
+    from validator import Validator
+
+    checks = [('{0:03d}'.format(r.id), r.pattern,
+               lambda text, r=r: list(r.regexpr.finditer(text)))
+              for r in rules.RULES_LIST]
+    checks.append(('math_env_regex', Validator.math_env_regex.pattern,
+                   Validator.math_env_regex.split))
+
+    report = []
+    for name, pattern, func in checks:
+        small = pathological_inputs(pattern, sizes[0])
+        large = pathological_inputs(pattern, sizes[-1])
+        for kind in sorted(small):
+            before = _time(func, small[kind])
+            after = _time(func, large[kind])
+            if after < min_time:
+                continue
+
+            exponent = (math.log(after / max(before, 1e-9)) /
+                        math.log(float(len(large[kind])) / len(small[kind])))
+            if exponent > max_exponent:
+                report.append((name, kind, exponent, after))
+
+    report.sort(key=lambda row: -row[3])
+    return report
+
+
+def format_audit(report):
+    lines = ['{0:>14} {1:>18} {2:>9} {3:>12}'.format(
+        'rule', 'input', 'exponent', 'time (ms)')]
+    for name, kind, exponent, seconds in report:
+        lines.append('{0:>14} {1:>18} {2:>9.2f} {3:>12.3f}'.format(
+            name, kind, exponent, seconds * 1000))
+    return '\n'.join(lines)
@@ -0,0 +1,232 @@
+"""This module contains code to follow the mistakes across a git history.
+
+Run it with `draftcheck history REPO`. Most files are the same from one commit
+to the next, so the files of each commit are listed with `git ls-tree` and
+only the blobs not seen before are read and checked. The number of violations
+of each rule in a blob is kept by its id, and in the cache by its id and the
+ruleset fingerprint, so that the cost grows with the number of distinct blobs
+rather than with the number of commits.
+"""
+
+import json
+import subprocess
+import sys
+import time
+
+from cStringIO import StringIO
+
+from cache import Cache
+from gitdiff import GitError, run_git
+from script import (add_rule_options, apply_rule_options, check_document,
+                    check_lines, chunk_limit, count_violations)
+from validator import Validator
+
+
+def list_commits(repo, rev='HEAD'):
+    """Return the (commit, timestamp) pairs of a history, oldest first."""
+    out = run_git(['rev-list', '--reverse', '--timestamp', rev, '--'],
+                  cwd=repo)
+    commits = []
+    for line in out.splitlines():
+        timestamp, commit = line.split()
+        commits.append((commit, int(timestamp)))
+    return commits
+
+
+def list_blobs(repo, commit, extensions=('.tex',)):
+    """Return the (path, blob) pairs of the files in a commit."""
+    out = run_git(['ls-tree', '-r', '-z', commit], cwd=repo)
+    blobs = []
+    for entry in out.split('\0'):
+        if not entry:
+            continue
+        info, path = entry.split('\t', 1)
+        mode, kind, blob = info.split()
+        if kind == 'blob' and path.endswith(extensions):
+            blobs.append((path, blob))
+    return blobs
+
+
+class BlobReader(object):
+    """Read blobs through a single `git cat-file --batch` process."""
+
+    def __init__(self, repo):
+        self._process = subprocess.Popen(
+            ['git', 'cat-file', '--batch'], cwd=repo,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, blob):
+        """Return the contents of a blob, given its id."""
+        self._process.stdin.write(blob + '\n')
+        self._process.stdin.flush()
+        header = self._process.stdout.readline().split()
+        if len(header) != 3:
+            raise GitError('cannot read blob {0}'.format(blob))
+
+        content = self._process.stdout.read(int(header[2]))
+        self._process.stdout.read(1)
+        return content
+
+    def close(self):
+        self._process.stdin.close()
+        self._process.wait()
+
+
+def history(repo, rev='HEAD', extensions=('.tex',), whole_document=False,
+            cache=None, stats=None, **kwargs):
+    """Count the violations of each rule in every commit of a history.
+
+    Other keyword arguments, such as `single_pass`, are passed on to
+    `Validator`.
+
+    Parameters
+    ----------
+    repo : string
+        A directory of the git repository.
+    rev : string, optional
+        The commit whose history is followed, or any revision range taken by
+        `git rev-list`.
+    extensions : tuple of string, optional
+        The extensions of the files to check.
+    whole_document : boolean, optional
+        Whether to validate the files as a whole rather than line by line.
+    cache : cache.Cache, optional
+        If given, the counts of each blob are looked up in the cache, and
+        stored there when the blob has to be checked.
+    stats : dict, optional
+        If given, the number of blobs checked is added to `stats['checked']`
+        and the number of blobs found in the cache to `stats['cached']`.
+
+    Yields
+    ------
+    commit, timestamp, num_files, counts : (string, int, int, dict)
+        Each commit, oldest first, with its commit time, the number of files
+        checked and a dict mapping the ids of the rules violated to their
+        number of violations in those files.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('checked', 0)
+    stats.setdefault('cached', 0)
+
+    # The counts of every blob seen so far, which are small
+    known = {}
+    commits = list_commits(repo, rev)
+    reader = BlobReader(repo)
+    try:
+        for commit, timestamp in commits:
+            blobs = list_blobs(repo, commit, extensions)
+            totals = {}
+            for path, blob in blobs:
+                if blob not in known:
+                    known[blob] = _count_blob(reader, blob, whole_document,
+                                              cache, stats, kwargs)
+                for rule_id, count in known[blob].items():
+                    totals[rule_id] = totals.get(rule_id, 0) + count
+            yield commit, timestamp, len(blobs), totals
+    finally:
+        reader.close()
+
+
+def _count_blob(reader, blob, whole_document, cache, stats, options):
+    """Return the counts of a blob, as a dict, checking it if needed."""
+    if cache is not None:
+        # Blob ids already are digests of the contents
+        key = cache.key(blob, 'blob', whole_document,
+                        options.get('max_chunk_length'),
+                        options.get('lexer'))
+        counts = cache.get(key)
+        if counts is not None:
+            stats['cached'] += 1
+            return counts
+
+    content = reader.read(blob)
+    validator = Validator(**options)
+    if whole_document:
+        counts = check_document(content, validator, count_violations)
+    else:
+        counts = check_lines(StringIO(content), validator,
+                             sink=count_violations)
+    counts = dict((rule_id, count) for rule_id, count in enumerate(counts)
+                  if count)
+    stats['checked'] += 1
+
+    if cache is not None:
+        cache.put(key, counts)
+    return counts
+
+
+def format_commit(commit, timestamp, num_files, counts):
+    """Format the counts of a commit on a single line."""
+    date = time.strftime('%Y-%m-%d %H:%M', time.gmtime(timestamp))
+    columns = ' '.join('{0:03d}:{1}'.format(rule_id, counts[rule_id])
+                       for rule_id in sorted(counts))
+    return '{0} {1} {2:>5} files {3:>7} mistakes  {4}'.format(
+        commit[:12], date, num_files, sum(counts.values()), columns).rstrip()
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='draftcheck history',
+        description='Count the mistakes of each rule in every commit of a '
+                    'git repository, checking each distinct file once.')
+    parser.add_argument('repo',
+                        help='Directory of the git repository')
+    parser.add_argument('--rev', default='HEAD',
+                        help='Commit whose history is followed, or a '
+                             'revision range such as v1..HEAD')
+    add_rule_options(parser)
+    parser.add_argument('--whole-document', action='store_true',
+                        help='Check each file as a whole rather than line by '
+                             'line')
+    parser.add_argument('--cache-dir',
+                        help='Directory in which to cache the counts of each '
+                             'file')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Check every distinct file without using the '
+                             'cache')
+    parser.add_argument('--format', choices=['human', 'jsonl'],
+                        default='human',
+                        help='Format to report the counts in')
+
+    args = parser.parse_args(argv)
+
+    apply_rule_options(parser, args)
+
+    cache = None if args.no_cache else Cache(args.cache_dir)
+    stats = {}
+    commits = history(args.repo, args.rev,
+                      whole_document=args.whole_document, cache=cache,
+                      stats=stats, single_pass=args.single_pass,
+                      lexer=args.lexer,
+                      max_chunk_length=chunk_limit(args.max_chunk_length,
+                                                   args.whole_document))
+
+    num_commits = 0
+    try:
+        for commit, timestamp, num_files, counts in commits:
+            if args.format == 'jsonl':
+                print json.dumps({
+                    'commit': commit,
+                    'time': timestamp,
+                    'files': num_files,
+                    'counts': dict((str(rule_id), count)
+                                   for rule_id, count in counts.items()),
+                    'total': sum(counts.values()),
+                }, sort_keys=True)
+            else:
+                print format_commit(commit, timestamp, num_files, counts)
+            num_commits += 1
+    except (GitError, OSError) as e:
+        parser.error('cannot read the history of {0}: {1}'.format(
+            args.repo, e))
+
+    print >> sys.stderr, ('Checked {0} distinct files in {1} commits, '
+                          'reusing {2} from the cache.').format(
+        stats['checked'], num_commits, stats['cached'])
+
+    if cache is not None:
+        cache.prune()
+    return 0
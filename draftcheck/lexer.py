@@ -0,0 +1,187 @@
+"""This module contains a lexer splitting LaTeX into typed segments."""
+
+import collections
+import re
+
+# Environments whose contents are typeset as they are
+VERBATIM_ENVS = ['verbatim', 'verbatim*', 'Verbatim', 'lstlisting', 'minted',
+                 'comment']
+
+# Commands whose arguments are names or addresses rather than prose
+ARGUMENT_COMMANDS = ['label', 'ref', 'eqref', 'pageref', 'autoref', 'cref',
+                     'Cref', 'cite', 'citep', 'citet', 'citealp', 'nocite',
+                     'url', 'href', 'includegraphics', 'input', 'include',
+                     'subfile', 'usepackage', 'documentclass', 'bibliography',
+                     'bibliographystyle']
+
+# Every token the lexer acts on. No alternative looks past the end of a line,
+# and none backtracks over what it has looked at. A percent sign
+# after a digit is more likely a mistake than a comment, and is left in the
+# text for the rules to report.
+token_regex = re.compile(
+    r'(?P<escape>\\[\\$%])'
+    r'|(?P<env>\\(?P<action>begin|end)\s*{(?P<name>[\w*]+)})'
+    r'|(?P<command>\\(?:' + '|'.join(ARGUMENT_COMMANDS) + r')\*?'
+    r'(?:\[[^\]\n]*\])?{(?P<argument>[^{}\n]*)})'
+    r'|(?P<verb>\\verb\*?(?P<delimiter>[^\sa-zA-Z*])[^\n]*?(?P=delimiter))'
+    r'|(?P<open>\$\$|\$|\\\[|\\\()'
+    r'|(?P<close>\\\]|\\\))'
+    r'|(?P<comment>(?<!\d)%[^\n]*)'
+    r'|(?P<blank>\n[ \t]*(?=\n))')
+
+# The end of a verbatim environment, the only token within one
+verbatim_end_regex = re.compile(r'\\end\s*{(?:' + '|'.join(
+    re.escape(name) for name in VERBATIM_ENVS) + ')}')
+
+# The delimiter closing each delimiter opening maths
+CLOSING = {'$': '$', '$$': '$$', '\\[': '\\]', '\\(': '\\)'}
+
+
+class Segment(collections.namedtuple('Segment', 'kind start end env')):
+    """A stretch of LaTeX of a single kind.
+
+    Attributes
+    ----------
+    kind : string
+        One of 'text', 'math' (inline maths, with its delimiters), 'display'
+        (displayed maths and maths environments), 'comment', 'verbatim' or
+        'argument' (the arguments of commands such as `\\ref` and `\\url`).
+    start, end : int
+        The offsets of the segment in the text that was lexed.
+    env : string
+        The kind of environment the segment is in, as in `rules.rule`: that of
+        the innermost environment for text, or 'math' for maths.
+    """
+    __slots__ = ()
+
+
+def lex(text, envs, kinds):
+    """Split LaTeX into typed segments, in a single pass.
+
+    Environments are tracked wherever `\\begin{...}` and `\\end{...}` are,
+    the bodies of verbatim environments and comments are set apart, and
+    maths opened by `$`, `$$`, `\\[` or `\\(` runs to its closing delimiter,
+    or at most to the end of the paragraph or of the text.
+
+    Parameters
+    ----------
+    text : string or buffer
+        The text to lex, such as a line or a whole document.
+    envs : list of string
+        The environment stack at the start of the text, innermost environment
+        last. It is updated in place as the text is lexed, and verbatim
+        environments are pushed on it as 'verbatim'.
+    kinds : dict
+        Maps the names of environments to their kind, such as 'math'. Other
+        environments are 'unknown'.
+
+    Yields
+    ------
+    segment : Segment
+        The non-empty segments making up the text, in order.
+    """
+    # The delimiter of the maths currently open, if any
+    delimiter = None
+    start = 0
+
+    def current():
+        if delimiter is not None:
+            return ('math' if delimiter in ('$', '\\(') else 'display'), 'math'
+        elif envs[-1] == 'verbatim':
+            return 'verbatim', 'verbatim'
+        elif envs[-1] == 'math':
+            return 'display', 'math'
+        return 'text', envs[-1]
+
+    def segment(end, kind=None):
+        if end <= start:
+            return []
+        if kind is None:
+            kind, env = current()
+        else:
+            env = current()[1]
+        return [Segment(kind, start, end, env)]
+
+    pos = 0
+    while True:
+        if envs[-1] == 'verbatim':
+            # Nothing but the end of the environment means anything within it
+            match = verbatim_end_regex.search(text, pos)
+            if match is None:
+                break
+            for s in segment(match.start()):
+                yield s
+            start = match.start()
+            pos = match.end()
+            envs.pop()
+            continue
+
+        match = token_regex.search(text, pos)
+        if match is None:
+            break
+        pos = match.end()
+
+        group = match.lastgroup
+        if group == 'escape' or (group == 'blank' and delimiter is None):
+            continue
+
+        if group == 'env':
+            name = match.group('name')
+            if match.group('action') == 'begin':
+                for s in segment(match.end()):
+                    yield s
+                start = match.end()
+                envs.append('verbatim' if name in VERBATIM_ENVS
+                            else kinds.get(name, 'unknown'))
+            elif len(envs) > 1:
+                for s in segment(match.start()):
+                    yield s
+                start = match.start()
+                envs.pop()
+        elif group == 'command':
+            for s in segment(match.start('argument')):
+                yield s
+            start = match.start('argument')
+            for s in segment(match.end('argument'), 'argument'):
+                yield s
+            start = match.end('argument')
+        elif group == 'verb':
+            if delimiter is None:
+                for s in segment(match.start()):
+                    yield s
+                start = match.start()
+                for s in segment(match.end(), 'verbatim'):
+                    yield s
+                start = match.end()
+        elif group == 'comment':
+            for s in segment(match.start()):
+                yield s
+            start = match.start()
+            for s in segment(match.end(), 'comment'):
+                yield s
+            start = match.end()
+        elif group == 'blank':
+            # Maths left open does not carry on past the end of a paragraph
+            for s in segment(match.start()):
+                yield s
+            start = match.start()
+            delimiter = None
+        elif delimiter is None:
+            if group == 'open':
+                for s in segment(match.start()):
+                    yield s
+                start = match.start()
+                delimiter = match.group()
+        elif match.group() == CLOSING[delimiter]:
+            for s in segment(match.end()):
+                yield s
+            start = match.end()
+            delimiter = None
+        elif delimiter == '$' and match.group() == '$$':
+            # The first dollar closes the maths and the second opens more
+            for s in segment(match.start() + 1):
+                yield s
+            start = match.start() + 1
+
+    for s in segment(len(text)):
+        yield s
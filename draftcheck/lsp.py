@@ -0,0 +1,247 @@
+"""This module contains a language server reporting violations to editors."""
+
+import json
+import sys
+
+from rules import get_brief, get_rule
+from validator import Validator
+
+# LSP diagnostic severity of rule violations
+SEVERITY_WARNING = 2
+
+
+def split_lines(text):
+    """Split text into lines, keeping the newline at the end of each line."""
+    lines = text.split('\n')
+    return [line + '\n' for line in lines[:-1]] + [lines[-1]]
+
+
+class Document(object):
+    """An open document which is revalidated incrementally as it is edited.
+
+    Alongside the lines of the document, the environment stack of the
+    validator before each line and the violations on each line are kept.
+    After an edit, only the edited lines are validated again, followed by
+    the lines after them for as long as their environment stack has changed.
+
+    Parameters
+    ----------
+    text : string
+        The initial contents of the document.
+
+    Other keyword arguments, such as `single_pass` or `lexer`, are passed on
+    to the `Validator` of the document.
+    """
+
+    def __init__(self, text, **options):
+        self.options = options
+
+        # An empty document has a single empty line
+        self.lines = ['']
+        self.envs = [Validator().envs] * 2
+        self.violations = [[]]
+        self.update(text)
+
+    def update(self, text, start=None, end=None):
+        """Replace the text between two positions and revalidate.
+
+        Parameters
+        ----------
+        text : string
+            The replacement text.
+        start, end : (line, character), optional
+            The positions of the start and end of the replaced text. The whole
+            document is replaced if they are not given.
+
+        Returns
+        -------
+        count : int
+            The number of lines that were validated again.
+        """
+        if start is None:
+            start, end = (0, 0), (len(self.lines) - 1, None)
+
+        first, last = start[0], end[0]
+        prefix = self.lines[first][:start[1]]
+        suffix = self.lines[last][end[1]:] if end[1] is not None else ''
+        new_lines = split_lines(prefix + text + suffix)
+        if last < len(self.lines) - 1:
+            # The replaced lines end with a newline, but are not the last ones
+            new_lines.pop()
+
+        # The environment stack is unknown for the new lines, except for the
+        # one following them, whose old value is kept to compare with
+        self.lines[first:last + 1] = new_lines
+        self.violations[first:last + 1] = [None] * len(new_lines)
+        self.envs[first + 1:last + 1] = [None] * (len(new_lines) - 1)
+
+        return self._revalidate(first, first + len(new_lines))
+
+    def _revalidate(self, first, stop):
+        """Validate from line `first` until the state matches past `stop`."""
+        validator = Validator(envs=self.envs[first], **self.options)
+
+        lineno = first
+        while lineno < len(self.lines):
+            if lineno >= stop and self.envs[lineno] == validator.envs:
+                break
+
+            self.envs[lineno] = validator.envs
+            self.violations[lineno] = [
+                (span[0], span[1], rule.id)
+                for rule, span in validator.validate(self.lines[lineno])]
+            lineno += 1
+        else:
+            self.envs[lineno] = validator.envs
+
+        return lineno - first
+
+    def diagnostics(self):
+        """Return the LSP diagnostics for the violations in the document."""
+        diagnostics = []
+        for lineno, violations in enumerate(self.violations):
+            if not violations:
+                continue
+
+            length = len(self.lines[lineno].rstrip('\r\n'))
+            for start, end, rule_id in violations:
+                diagnostics.append({
+                    'range': {
+                        'start': {'line': lineno, 'character': start},
+                        'end': {'line': lineno,
+                                'character': max(start, min(end, length))},
+                    },
+                    'severity': SEVERITY_WARNING,
+                    'code': rule_id,
+                    'source': 'draftcheck',
+                    'message': get_brief(get_rule(rule_id)),
+                })
+        return diagnostics
+
+
+class LanguageServer(object):
+    """A language server speaking JSON-RPC over a pair of streams.
+
+    Documents are synchronised incrementally and diagnostics are published
+    each time a document is opened or changed. Positions are counted in
+    characters of the decoded text.
+
+    Parameters
+    ----------
+    infile, outfile : file
+        The streams to read requests from and write messages to.
+
+    Other keyword arguments are passed on to each `Document`. Requests which
+    fail are answered with an internal error, and notifications which fail
+    are logged to the standard error and skipped.
+    """
+
+    def __init__(self, infile=sys.stdin, outfile=sys.stdout, **options):
+        self.infile = infile
+        self.outfile = outfile
+        self.options = options
+        self.documents = {}
+        self.shutting_down = False
+
+    def serve(self):
+        """Handle messages until told to exit. Return the exit code."""
+        while True:
+            message = self.read_message()
+            if message is None or message.get('method') == 'exit':
+                return 0 if self.shutting_down else 1
+
+            handler = getattr(self, 'on_' + message.get('method', '')
+                              .replace('/', '_').replace('$', '_'), None)
+            if 'id' not in message:
+                if handler is None:
+                    continue
+                try:
+                    handler(message.get('params') or {})
+                except Exception as e:
+                    print >> sys.stderr, 'draftcheck: {0} failed: {1!r}' \
+                        .format(message['method'], e)
+            elif handler is None:
+                self.write_message({'jsonrpc': '2.0', 'id': message['id'],
+                                    'error': {'code': -32601,
+                                              'message': 'Method not found'}})
+            else:
+                try:
+                    result = handler(message.get('params') or {})
+                except Exception as e:
+                    self.write_message({'jsonrpc': '2.0',
+                                        'id': message['id'],
+                                        'error': {'code': -32603,
+                                                  'message': repr(e)}})
+                    continue
+                self.write_message({'jsonrpc': '2.0', 'id': message['id'],
+                                    'result': result})
+
+    def read_message(self):
+        """Read a message, returning None at the end of the stream."""
+        length = None
+        while True:
+            header = self.infile.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+
+        if length is None:
+            return None
+        return json.loads(self.infile.read(length).decode('utf-8'))
+
+    def write_message(self, message):
+        body = json.dumps(message)
+        self.outfile.write('Content-Length: {0}\r\n\r\n{1}'
+                           .format(len(body), body))
+        self.outfile.flush()
+
+    def publish(self, uri):
+        self.write_message({
+            'jsonrpc': '2.0',
+            'method': 'textDocument/publishDiagnostics',
+            'params': {'uri': uri,
+                       'diagnostics': self.documents[uri].diagnostics()},
+        })
+
+    def on_initialize(self, params):
+        return {'capabilities': {'textDocumentSync': {'openClose': True,
+                                                      'change': 2}},
+                'serverInfo': {'name': 'draftcheck'}}
+
+    def on_shutdown(self, params):
+        self.shutting_down = True
+        return None
+
+    def on_textDocument_didOpen(self, params):
+        document = params['textDocument']
+        self.documents[document['uri']] = Document(document['text'],
+                                                   **self.options)
+        self.publish(document['uri'])
+
+    def on_textDocument_didChange(self, params):
+        uri = params['textDocument']['uri']
+        document = self.documents[uri]
+        for change in params['contentChanges']:
+            if 'range' in change:
+                start = change['range']['start']
+                end = change['range']['end']
+                document.update(change['text'],
+                                (start['line'], start['character']),
+                                (end['line'], end['character']))
+            else:
+                document.update(change['text'])
+        self.publish(uri)
+
+    def on_textDocument_didClose(self, params):
+        uri = params['textDocument']['uri']
+        self.documents.pop(uri, None)
+        self.write_message({
+            'jsonrpc': '2.0',
+            'method': 'textDocument/publishDiagnostics',
+            'params': {'uri': uri, 'diagnostics': []},
+        })
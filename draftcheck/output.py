@@ -0,0 +1,263 @@
+"""This module contains writers reporting violations in several formats."""
+
+from draftcheck import __version__
+from rules import RULES_LIST, get_brief, get_rule, skipped_rule
+
+SARIF_SCHEMA = ('https://raw.githubusercontent.com/oasis-tcs/sarif-spec/'
+                'master/Schemata/sarif-schema-2.1.0.json')
+
+
+def pad_string(text, span, size):
+    left_str = text[max(0, span[0] - size):span[0]]
+    right_str = text[span[1]:min(len(text), span[1] + size)]
+
+    text_format = '{0}{1}{2}'
+
+    if len(left_str) == size:
+        text_format = '...' + text_format
+
+    if len(right_str) == size:
+        text_format += '...'
+
+    padded_str = text_format.format(left_str, text[span[0]:span[1]], right_str)
+    start_index = len(left_str) + (3 if len(left_str) == size else 0)
+
+    return padded_str, start_index
+
+
+def format_warning(fname, lineno, line, span, rule):
+    """Format a violation for people to read, with the text around it."""
+    prefix = '{0}:{1}:{2}:'.format(fname, lineno, span[0])
+
+    padded_str, start_index = pad_string(line, span, 10)
+    if rule.show_spaces:
+        padded_str = padded_str.replace(' ', '_')
+
+    return '{0} {1}\n{2}{3}\n\t[{4:03d}] {5}\n\n'.format(
+        prefix, padded_str, ' ' * (len(prefix) + start_index + 1),
+        '^' * (span[1] - span[0]), rule.id, get_brief(rule))
+
+
+def _dumps(obj):
+    """Encode an object as JSON, importing json only when it is needed."""
+    import json
+    return json.dumps(obj, sort_keys=True)
+
+
+def _decode(text):
+    """Decode text read from a file for JSON, whatever its encoding."""
+    if isinstance(text, unicode):
+        return text
+    return text.decode('utf-8', 'replace')
+
+
+def violation_record(lineno, span, rule):
+    """Describe a violation as a dictionary, for JSON.
+
+    The line and column numbers count from 0, as in the human format.
+    """
+    return {
+        'line': lineno,
+        'column': span[0],
+        'end_column': span[1],
+        'rule': rule.id,
+        'message': get_brief(rule),
+    }
+
+
+def format_counts(counts):
+    """Format the number of violations of each rule, the most common first.
+
+    Parameters
+    ----------
+    counts : dict
+        Maps the ids of rules to their number of violations.
+    """
+    lines = []
+    for rule_id, count in sorted(counts.items(),
+                                 key=lambda item: (-item[1], item[0])):
+        lines.append('{0:>8} [{1:03d}] {2}'.format(
+            count, rule_id, get_brief(get_rule(rule_id))))
+    lines.append('{0:>8} in total'.format(sum(counts.values())))
+    return '\n'.join(lines)
+
+
+class BufferedWriter(object):
+    """Base class of the writers of reports.
+
+    Writers stream what they are given to an output stream, rather than
+    holding on to it. What is written is buffered and written out in large
+    blocks, once at least `buffer_size` bytes are pending and when the writer
+    is closed.
+
+    Parameters
+    ----------
+    stream : file
+        The stream to write to.
+    buffer_size : int, optional
+        The number of bytes to buffer before writing them out.
+    """
+
+    def __init__(self, stream, buffer_size=1 << 16):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._pending = 0
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._pending += len(text)
+        if self._pending >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.stream.write(''.join(self._buffer))
+        self.stream.flush()
+        self._buffer = []
+        self._pending = 0
+
+    def begin(self):
+        """Start writing the report."""
+
+    def end(self, num_errors):
+        """Finish the report, given the total number of violations."""
+        self.flush()
+
+
+class Writer(BufferedWriter):
+    """Base class of the writers of violations.
+
+    Subclasses define `violation(fname, lineno, line, span, rule)`, which
+    writes a violation given its line and span as `check_lines` records
+    them.
+    """
+
+
+class SummaryWriter(BufferedWriter):
+    """Base class of the writers of the number of violations of each rule.
+
+    Summary writers are given the counts of each file rather than the
+    violations themselves: subclasses define `counts(fname, counts)`, where
+    `counts` maps rule ids to their number of violations in the file.
+    """
+
+
+class HumanWriter(Writer):
+    """Write violations with the text around them for people to read."""
+
+    def violation(self, fname, lineno, line, span, rule):
+        self.write(format_warning(fname, lineno, line, span, rule))
+
+    def end(self, num_errors):
+        if num_errors > 0:
+            self.write('\nTotal of {0} mistakes found.\n'.format(num_errors))
+        else:
+            self.write('No mistakes found.\n')
+        self.flush()
+
+
+class JSONLinesWriter(Writer):
+    """Write each violation as a JSON object on its own line.
+
+    The objects are those of `violation_record`, along with the file name.
+    """
+
+    def violation(self, fname, lineno, line, span, rule):
+        record = violation_record(lineno, span, rule)
+        record['file'] = _decode(fname)
+        self.write(_dumps(record) + '\n')
+
+
+class SARIFWriter(Writer):
+    """Write violations as a SARIF 2.1.0 log, for code scanning tools.
+
+    The log is streamed: the results are written out as they come, between
+    the start and the end of the enclosing JSON document.
+    """
+
+    def begin(self):
+        driver = {
+            'name': 'draftcheck',
+            'version': __version__,
+            'informationUri': 'https://github.com/ebnn/draftcheck',
+            'rules': [{'id': '{0:03d}'.format(r.id),
+                       'shortDescription': {'text': get_brief(r)}}
+                      for r in [skipped_rule] + RULES_LIST],
+        }
+        log = _dumps({'version': '2.1.0', '$schema': SARIF_SCHEMA,
+                      'runs': [{'tool': {'driver': driver},
+                                'results': 'RESULTS'}]})
+
+        # Write everything up to the list of results, which is left open
+        header, self._footer = log.split('"RESULTS"')
+        self.write(header + '[')
+        self._first = True
+
+    def violation(self, fname, lineno, line, span, rule):
+        result = {
+            'ruleId': '{0:03d}'.format(rule.id),
+            'level': 'warning',
+            'message': {'text': get_brief(rule)},
+            'locations': [{'physicalLocation': {
+                'artifactLocation': {'uri': _decode(fname)},
+                'region': {'startLine': lineno + 1,
+                           'startColumn': span[0] + 1,
+                           'endColumn': span[1] + 1},
+            }}],
+        }
+        self.write(('' if self._first else ',') +
+                   _dumps(result))
+        self._first = False
+
+    def end(self, num_errors):
+        self.write(']' + self._footer + '\n')
+        self.flush()
+
+
+class HumanSummaryWriter(SummaryWriter):
+    """Write how often each rule is violated in each file, and in all."""
+
+    def __init__(self, stream, buffer_size=1 << 16):
+        super(HumanSummaryWriter, self).__init__(stream, buffer_size)
+        self._totals = {}
+
+    def counts(self, fname, counts):
+        """Write the counts of a file, mapping rule ids to violations."""
+        self.write('{0}\n{1}\n\n'.format(fname, format_counts(counts)))
+        for rule_id, count in counts.items():
+            self._totals[rule_id] = self._totals.get(rule_id, 0) + count
+
+    def end(self, num_errors):
+        if num_errors > 0:
+            self.write('All files\n{0}\n'.format(format_counts(self._totals)))
+        else:
+            self.write('No mistakes found.\n')
+        self.flush()
+
+
+class JSONLinesSummaryWriter(SummaryWriter):
+    """Write the counts of each file as a JSON object on its own line.
+
+    The counts map rule ids, as strings, to the number of violations.
+    """
+
+    def counts(self, fname, counts):
+        record = {
+            'file': _decode(fname),
+            'counts': dict((str(rule_id), count)
+                           for rule_id, count in counts.items()),
+            'total': sum(counts.values()),
+        }
+        self.write(_dumps(record) + '\n')
+
+
+WRITERS = {
+    'human': HumanWriter,
+    'jsonl': JSONLinesWriter,
+    'sarif': SARIFWriter,
+}
+
+SUMMARY_WRITERS = {
+    'human': HumanSummaryWriter,
+    'jsonl': JSONLinesSummaryWriter,
+}
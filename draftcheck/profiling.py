@@ -0,0 +1,64 @@
+"""This module contains code to measure the cost of each rule."""
+
+import json
+import timeit
+
+# Columns of the statistics kept for each rule
+FIELDS = ['time', 'calls', 'chunks', 'bytes', 'matches']
+
+
+class RuleProfile(object):
+    """Statistics on the rules run by validators.
+
+    For each rule id, this records the total time spent in the rule, the
+    number of times it was called, the number of non-empty chunks of text it
+    scanned, the number of bytes in them and the number of violations found.
+
+    A validator only times its rules when given a profile, and then checks
+    each rule on its own, even if asked to check them in a single pass.
+    """
+
+    def __init__(self):
+        self.stats = {}
+
+    def run(self, rule, chunk, env):
+        """Call a rule on a chunk of text and record its statistics."""
+        start = timeit.default_timer()
+        spans = list(rule(chunk, env))
+        elapsed = timeit.default_timer() - start
+
+        stats = self.stats.get(rule.id)
+        if stats is None:
+            stats = self.stats[rule.id] = [0.0, 0, 0, 0, 0]
+        stats[0] += elapsed
+        stats[1] += 1
+        if chunk:
+            stats[2] += 1
+            stats[3] += len(chunk)
+        stats[4] += len(spans)
+
+        return spans
+
+    def merge(self, stats):
+        """Add the statistics of another profile, such as a worker's."""
+        for rule_id, other in stats.items():
+            mine = self.stats.setdefault(rule_id, [0.0, 0, 0, 0, 0])
+            for i, value in enumerate(other):
+                mine[i] += value
+
+    def rows(self):
+        """Return (rule_id, stats) pairs, the most expensive rules first."""
+        return sorted(self.stats.items(), key=lambda row: (-row[1][0], row[0]))
+
+    def format_table(self):
+        lines = ['{0:>5} {1:>10} {2:>8} {3:>8} {4:>10} {5:>8}'.format(
+            'rule', 'time (ms)', 'calls', 'chunks', 'bytes', 'matches')]
+        for rule_id, stats in self.rows():
+            lines.append('{0:>5} {1:>10.3f} {2:>8} {3:>8} {4:>10} {5:>8}'
+                         .format('{0:03d}'.format(rule_id), stats[0] * 1000,
+                                 *stats[1:]))
+        return '\n'.join(lines)
+
+    def format_json(self):
+        return json.dumps([dict(zip(['rule'] + FIELDS, [rule_id] + stats))
+                           for rule_id, stats in self.rows()], indent=2)
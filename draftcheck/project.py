@@ -0,0 +1,104 @@
+"""This module contains code to follow the files included by LaTeX
+documents."""
+
+import collections
+import os
+import re
+
+from validator import Validator
+
+# Commands including other files, and the rest of a line after a comment
+include_regex = re.compile(r'\\(?:input|include|subfile)\s*{([^}]+)}')
+comment_regex = re.compile(r'(?<!\\)%.*')
+
+
+class Project(object):
+    """The files making up one or more LaTeX documents.
+
+    Starting from the top-level documents, the files they include with
+    `\\input`, `\\include` and `\\subfile` are followed in document order.
+    Along the way, the environment stack is tracked as `Validator` would if
+    the included files were pasted in place, without checking any rules. This
+    gives, for every physical file, the environment stack it is first included
+    in and the stack to continue with after each line including other files.
+    Each file can then be checked exactly once, independently of the others.
+
+    Parameters
+    ----------
+    roots : list of string
+        The file names of the top-level documents.
+    lexer : boolean, optional
+        Whether the files are to be validated with `lexer` set, in which case
+        environments are tracked as the lexer tracks them.
+
+    Attributes
+    ----------
+    files : OrderedDict
+        Maps the path of each file, in the order they are first included, to a
+        pair of the environment stack at its start and a dictionary mapping
+        the line numbers of lines including other files to the environment
+        stack after them.
+    graph : dict
+        Maps the path of each file to the paths of the files it includes.
+    missing : list of (path, lineno, name)
+        Included files which could not be found.
+    """
+
+    def __init__(self, roots, lexer=False):
+        self.lexer = lexer
+        self.files = collections.OrderedDict()
+        self.graph = {}
+        self.missing = []
+
+        # Environment stacks at the end of files, given the one at the start
+        self._ends = {}
+
+        for root in roots:
+            path = os.path.normpath(root)
+            self._base = os.path.dirname(path)
+            self._visit(path, Validator().envs, [])
+
+    def resolve(self, name):
+        """Return the path of an included file, as LaTeX would find it."""
+        path = os.path.join(self._base, name.strip())
+        if not os.path.splitext(path)[1] or not os.path.exists(path):
+            path += '.tex'
+        return os.path.normpath(path)
+
+    def _visit(self, path, envs, active):
+        """Follow a file included with `envs`, returning the stack after it."""
+        if (path, envs) in self._ends:
+            return self._ends[path, envs]
+
+        first = path not in self.files
+        if first:
+            self.files[path] = (envs, {})
+            self.graph[path] = []
+        resume = self.files[path][1]
+
+        validator = Validator(envs=envs, lexer=self.lexer)
+        active.append(path)
+        with open(path, 'r') as infile:
+            for lineno, line in enumerate(infile):
+                # Only track the environment, without checking any rules
+                validator.track(line)
+
+                names = include_regex.findall(comment_regex.sub('', line))
+                for name in names:
+                    child = self.resolve(name)
+                    if not os.path.exists(child):
+                        if first:
+                            self.missing.append((path, lineno, name))
+                        continue
+                    if first and child not in self.graph[path]:
+                        self.graph[path].append(child)
+                    if child not in active:
+                        validator.reset(self._visit(child, validator.envs,
+                                                    active))
+
+                if names and first:
+                    resume[lineno] = validator.envs
+        active.pop()
+
+        self._ends[path, envs] = validator.envs
+        return validator.envs
@@ -1,12 +1,26 @@
 """This module contains rule definitions."""
 
+import functools
 import re
 
 # Global rules list to store all the registered rules
 RULES_LIST = []
 
+# Rules that apply in each environment, in the order they were registered.
+# Rules applying in any environment are listed under every environment, and
+# the 'any' entry is used for environments that have no rules of their own.
+DISPATCH_TABLE = {'paragraph': [], 'math': [], 'unknown': [], 'any': []}
 
-def rule(pattern, show_spaces=False, in_env='paragraph'):
+# Incremented whenever the dispatch table changes, so that anything derived
+# from it can tell when it is out of date
+VERSION = 0
+
+# The rule ids or names given to `select_rules`
+_selected = None
+_ignored = ()
+
+
+def rule(pattern, show_spaces=False, in_env='paragraph', fix=None):
     """Decorator used to create rules.
 
     The decorated function must have the following signature:
@@ -36,46 +50,190 @@ def rule(pattern, show_spaces=False, in_env='paragraph'):
         the specified environment are checked against this rule. This may be
         set to 'any' if this rule applies in any environment. Defaults to
         'paragraph'.
+    fix : function, optional
+        If the violations of this rule can be fixed mechanically, a function
+        called with the substring violating the rule and the text before it
+        on its line, which returns the text to replace the substring with, or
+        None if that violation cannot be fixed.
     """
-    regexpr = re.compile(pattern)
-
     def inner_rule(func):
-        def wrapper(text, env):
-            if in_env == 'any' or env == in_env:
-                return func(text, regexpr.finditer(text))
-            return []
+        r = Rule(func, pattern, show_spaces, in_env, fix)
+
+        # Add it to our global rules list
+        RULES_LIST.append(r)
+        _dispatch(r)
+
+        return r
+    return inner_rule
+
+
+class Rule(object):
+    """A registered rule, created by the `rule` decorator.
+
+    Calling a rule with some text and the environment it is in returns the
+    spans of the substrings violating the rule. The pattern of the rule is
+    only compiled the first time it is needed, so that rules which are never
+    used cost nothing.
+
+    Attributes
+    ----------
+    id : int
+        The number of the rule, in the order rules are registered.
+    name : string
+        The name of the decorated function, or of the generator for rules made
+        by `rule_generator`.
+    pattern : string
+        The regular expression matching candidate violations.
+    func : function
+        The undecorated function, which other scanning engines may call
+        directly with matches of `regexpr`.
+    show_spaces, in_env, fix
+        The parameters given to `rule`.
+    """
 
-        # Store the parameters in the function as attributes
-        wrapper.id = len(RULES_LIST) + 1
-        wrapper.show_spaces = show_spaces
-        wrapper.in_env = in_env
+    def __init__(self, func, pattern, show_spaces, in_env, fix=None):
+        self.id = len(RULES_LIST) + 1
+        self.name = func.__name__
+        self.pattern = pattern
+        self.func = func
+        self.show_spaces = show_spaces
+        self.in_env = in_env
+        self.fix = fix
+        self._regexpr = None
 
         # Inherit the docstring from the function
-        wrapper.__doc__ = func.__doc__
+        self.__doc__ = func.__doc__
 
-        # Add it to our global rules list
-        RULES_LIST.append(wrapper)
+    @property
+    def regexpr(self):
+        """The compiled pattern of the rule."""
+        if self._regexpr is None:
+            self._regexpr = re.compile(self.pattern)
+        return self._regexpr
 
-        return wrapper
-    return inner_rule
+    def __call__(self, text, env):
+        if self.in_env == 'any' or env == self.in_env:
+            return self.func(text, self.regexpr.finditer(text))
+        return []
+
+    def __repr__(self):
+        return '<Rule {0:03d} {1}>'.format(self.id, self.name)
+
+
+def _dispatch(r):
+    """Add a newly registered rule to the dispatch table, if selected."""
+    global VERSION
+    VERSION += 1
+
+    if not is_selected(r):
+        return
+
+    if r.in_env == 'any':
+        for env_rules in DISPATCH_TABLE.values():
+            env_rules.append(r)
+    else:
+        if r.in_env not in DISPATCH_TABLE:
+            DISPATCH_TABLE[r.in_env] = list(DISPATCH_TABLE['any'])
+        DISPATCH_TABLE[r.in_env].append(r)
+
+
+def _matches(r, names):
+    return any(str(r.id) == name.lstrip('0') or r.name == name
+               for name in names)
+
+
+def unknown_names(names):
+    """Return the ids or names which match none of the registered rules."""
+    return [name for name in names
+            if not any(_matches(r, [name]) for r in RULES_LIST)]
+
+
+def is_selected(r):
+    """Return whether a rule was selected by `select_rules`."""
+    if _selected is not None and not _matches(r, _selected):
+        return False
+    return not _matches(r, _ignored)
+
+
+def select_rules(select=None, ignore=None):
+    """Choose which of the registered rules are checked.
 
+    Rules which are not selected are left out of the dispatch table, so they
+    are never compiled nor called. This also applies to rules registered
+    later on.
 
-def rule_generator(show_spaces=False, in_env='paragraph'):
-    """Decorator that generates rules from a generator."""
+    Parameters
+    ----------
+    select : list of string, optional
+        The ids (such as '6' or '006') or names (such as
+        'check_unescaped_percentage') of the only rules to check. The names of
+        rules made by `rule_generator` are those of their generator. Defaults
+        to all the rules.
+    ignore : list of string, optional
+        The ids or names of rules not to check.
+    """
+    global _selected, _ignored
+    _selected = list(select) if select is not None else None
+    _ignored = list(ignore or ())
+
+    for env_rules in DISPATCH_TABLE.values():
+        del env_rules[:]
+    for r in RULES_LIST:
+        _dispatch(r)
+
+
+def rules_for_env(env):
+    """Return the rules that apply to text in the environment `env`."""
+    return DISPATCH_TABLE.get(env, DISPATCH_TABLE['any'])
+
+
+def rule_generator(show_spaces=False, in_env='paragraph', fix=None):
+    """Decorator that generates rules from a generator.
+
+    The generator yields the pattern of each rule followed by the parameters
+    its docstring is formatted with. If given, `fix` is called with the
+    substring violating a rule and those parameters, as `fix` of `rule` but
+    without the text before the substring.
+    """
     def inner_rule(func):
         for r in func():
+            if fix is None:
+                fix_rule = None
+            else:
+                fix_rule = functools.partial(_fix_generated, fix, r[1:])
+
             # Register this rule into our global rules list
-            @rule(pattern=r[0], show_spaces=show_spaces, in_env=in_env)
+            @rule(pattern=r[0], show_spaces=show_spaces, in_env=in_env,
+                  fix=fix_rule)
             def generated_rule(_, matches):
                 return [m.span() for m in matches]
 
             # Format the docstring with parameters specific to this instance
             # of the rule
             RULES_LIST[-1].__doc__ = func.__doc__.format(*r[1:])
+            RULES_LIST[-1].name = func.__name__
     return inner_rule
 
 
-@rule(r'\s+\\footnote{', show_spaces=True)
+def _fix_generated(fix, args, text, before):
+    return fix(text, *args)
+
+
+def _fix_tie(text, before):
+    """Tie a command to the word before it with a non-breaking space.
+
+    Only a single space, or a word directly followed by the command, is
+    fixed: other characters, such as an opening parenthesis, are kept.
+    """
+    if text[0] == ' ' and not before[-1:].isspace():
+        return '~' + text[1:]
+    if re.match(r'\w', text):
+        return text[0] + '~' + text[1:]
+    return None
+
+
+@rule(r'\s+\\footnote{', show_spaces=True,
+      fix=lambda text, before: text.lstrip())
 def check_space_before_footnote(text, matches):
     """Do not precede footnotes with spaces.
 
@@ -126,7 +284,7 @@ def check_cite_used_as_noun(text, matches):
     return [m.span() for m in matches]
 
 
-@rule(r'[^~]\\cite{')
+@rule(r'[^~]\\cite{', fix=_fix_tie)
 def check_no_space_before_cite(text, matches):
     """Place a single, non-breaking space '~' before citations.
 
@@ -143,7 +301,7 @@ def check_no_space_before_cite(text, matches):
     return [m.span() for m in matches]
 
 
-@rule(r'[^~]\\ref{')
+@rule(r'[^~]\\ref{', fix=_fix_tie)
 def check_no_space_before_ref(text, matches):
     """Place a single, non-breaking space '~' before references.
 
@@ -158,7 +316,7 @@ def check_no_space_before_ref(text, matches):
     return [m.span() for m in matches]
 
 
-@rule(r'\d+%')
+@rule(r'\d+%', fix=lambda text, before: text[:-1] + '\\%')
 def check_unescaped_percentage(text, matches):
     """Escape percentages with backslash.
 
@@ -252,7 +410,7 @@ def check_duplicate_word(text, matches):
     return [m.span() for m in matches]
 
 
-@rule(r'\.\.\.')
+@rule(r'\.\.\.', fix=lambda text, before: '\\ldots{}')
 def check_dot_dot_dot(text, matches):
     """Typeset ellipses by \\ldots, not '...'.
 
@@ -499,7 +657,15 @@ def check_double_space(text, matches):
     return [m.span() for m in matches]
 
 
-@rule_generator()
+def _fix_abbreviation(text, correct):
+    # Some patterns match the character after the abbreviation as well
+    if not text.endswith('.'):
+        return correct + text[-1]
+    # The others only match right before a word, which is kept apart
+    return correct.rstrip('.') + '. '
+
+
+@rule_generator(fix=_fix_abbreviation)
 def check_incorrect_abbreviations():
     """Punctuate abbreviations correctly. Should be "{0}"."""
 
@@ -515,7 +681,14 @@ def check_incorrect_abbreviations():
         yield r'\b' + incorrect + r'\b', correct
 
 
-@rule_generator()
+def _fix_obsolete_command(text, correct):
+    # Only the font commands take their argument the same way
+    if correct.startswith('text'):
+        return '\\' + correct + '{'
+    return None
+
+
+@rule_generator(fix=_fix_obsolete_command)
 def check_obsolete_commands():
     """Use the \\{0} command instead."""
 
@@ -532,7 +705,7 @@ def check_obsolete_commands():
     }
 
     for incorrect, correct in changes.items():
-        yield '\\' + incorrect + '{', correct
+        yield re.escape('\\' + incorrect + '{'), correct
 
 
 @rule_generator()
@@ -556,7 +729,7 @@ def check_obsolete_packages():
     }
 
     for incorrect, correct in changes.items():
-        yield '\\' + incorrect + '{', correct
+        yield re.escape('\\' + incorrect + '{'), correct
 
 
 @rule_generator()
@@ -572,5 +745,30 @@ def check_obsolete_environments():
         yield '\\begin{' + incorrect + '}', correct
 
 
+def skipped_rule(text, env):
+    """Some rules were skipped: the text is too long to check them quickly.
+
+    Rules whose patterns may take time growing faster than linearly with the
+    length of the text are not checked on very long chunks of text, such as
+    generated tables. See `guard.is_risky`. On lines long enough to be
+    validated in windows, the rules whose matches may be longer than a window
+    sees are not checked either.
+    """
+    return []
+
+# The skipped rule stands in for the rules a validator did not check. It is
+# never registered, so that it is not run on any text.
+skipped_rule.id = 0
+skipped_rule.show_spaces = False
+skipped_rule.in_env = 'any'
+
+
+def get_rule(rule_id):
+    """Return the registered rule with the given id."""
+    if rule_id == skipped_rule.id:
+        return skipped_rule
+    return RULES_LIST[rule_id - 1]
+
+
 def get_brief(r):
     return r.__doc__.split('\n\n')[0]
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""This module contains an engine that checks all rules in a single pass."""
+
+import re
+
+import rules
+
+# Patterns using backreferences, named groups or inline flags change meaning
+# when they are embedded into a larger pattern, so they are never combined.
+_unsafe_regex = re.compile(r'\\[1-9]|\(\?P[<=]|\(\?[iLmsux]+\)')
+
+# Compiled matchers shared by all scanners, keyed by environment
+_cache = {}
+
+
+def _combine(patterns):
+    """Compile an alternation of patterns, or return None if impossible."""
+    try:
+        return re.compile('|'.join('(?:%s)' % p for p in patterns))
+    except (re.error, AssertionError, OverflowError):
+        # Python 2 only supports 100 groups in a single pattern
+        return None
+
+
+class Scanner(object):
+    """Find violations of every rule applicable to a chunk of text at once.
+
+    Instead of running each rule's regular expression over the whole chunk,
+    consecutive rules are merged into grouped matchers, and all of them are
+    merged into a single matcher. A chunk that matches none of the rules is
+    therefore dismissed after a single pass. When there is a candidate match,
+    only the groups that match are rechecked rule by rule, starting from the
+    position of the first candidate.
+
+    The results are exactly the same `(rule, span)` pairs, in the same order,
+    as calling every rule in `rules.RULES_LIST` on its own. This assumes that
+    a rule never reports a violation when its pattern does not match.
+
+    Parameters
+    ----------
+    group_size : int, optional
+        The maximum number of rules merged into each grouped matcher.
+    """
+
+    def __init__(self, group_size=8):
+        self.group_size = group_size
+
+    def _units(self, env):
+        """Return the matchers for the rules that apply in `env`."""
+        applicable = rules.rules_for_env(env)
+
+        key = (env, rules.VERSION, self.group_size)
+        if key in _cache:
+            return _cache[key]
+
+        safe = [r for r in applicable
+                if not _unsafe_regex.search(r.pattern)]
+
+        # Units are (matcher, members) pairs in rule order. A matcher of None
+        # means the member rule has to be run on its own.
+        units = []
+        group = []
+        for r in applicable:
+            if r in safe:
+                group.append(r)
+                if len(group) == self.group_size:
+                    units.extend(self._group_units(group))
+                    group = []
+            else:
+                if group:
+                    units.extend(self._group_units(group))
+                    group = []
+                units.append((None, [r]))
+        if group:
+            units.extend(self._group_units(group))
+
+        top = _combine([r.pattern for r in safe]) if safe else None
+
+        _cache[key] = top, units
+        return top, units
+
+    def _group_units(self, group):
+        regexpr = _combine([r.pattern for r in group])
+        if regexpr is None:
+            return [(None, [r]) for r in group]
+        return [(regexpr, group)]
+
+    def scan(self, text, env):
+        """Find the rules violated by a chunk of text in environment `env`.
+
+        Yields
+        ------
+        rule, span : (rule, (start, end))
+            The violated rule and the span of the offending substring.
+        """
+        top, units = self._units(env)
+
+        # No rule can match before the first match of the combined matcher
+        if top is not None:
+            match = top.search(text)
+            first = match.start() if match else None
+        else:
+            first = 0
+
+        for regexpr, members in units:
+            if regexpr is None:
+                for span in members[0].func(text,
+                                            members[0].regexpr.finditer(text)):
+                    yield members[0], span
+                continue
+
+            if first is None:
+                continue
+            match = regexpr.search(text, first)
+            if match is None:
+                continue
+
+            start = match.start()
+            for r in members:
+                for span in r.func(text, r.regexpr.finditer(text, start)):
+                    yield r, span
@@ -1,65 +1,799 @@
-from rules import get_brief
-from validator import Validator
+import array
+import functools
+import itertools
+import os
+import sys
 
+from cStringIO import StringIO
 
-def pad_string(text, span, size):
-    left_str = text[max(0, span[0] - size):span[0]]
-    right_str = text[span[1]:min(len(text), span[1] + size)]
+from output import SUMMARY_WRITERS, WRITERS
+from rules import (RULES_LIST, get_rule, select_rules, skipped_rule,
+                   unknown_names)
+from validator import WINDOW_SIZE, LineIndex, Validator, find_checkpoints
 
-    text_format = '{0}{1}{2}'
+# Files at least this large are memory-mapped when validated as a whole
+MMAP_THRESHOLD = 1 << 20
 
-    if len(left_str) == size:
-        text_format = '...' + text_format
+# Files are split into chunks of this size to be checked in parallel
+CHUNK_SIZE = 1 << 20
 
-    if len(right_str) == size:
-        text_format += '...'
+# Name the standard input is reported under
+STDIN_NAME = '<stdin>'
 
-    padded_str = text_format.format(left_str, text[span[0]:span[1]], right_str)
-    start_index = len(left_str) + (3 if len(left_str) == size else 0)
+# Configuration files read from the current directory, unless told otherwise
+CONFIG_FILES = ['setup.cfg', 'tox.ini', '.draftcheck.cfg']
 
-    return padded_str, start_index
+# Chunks longer than this are only checked with the rules safe on long text,
+# unless told otherwise, when checking line by line
+MAX_CHUNK_LENGTH = 10000
 
 
-def print_warning(fname, lineno, line, span, rule, args):
-    prefix = '{0}:{1}:{2}:'.format(fname, lineno, span[0])
-    print prefix,
+def read_config(fnames):
+    """Return the options in the [draftcheck] section of configuration files.
 
-    padded_str, start_index = pad_string(line, span, 10)
-    if rule.show_spaces:
-        print padded_str.replace(' ', '_')
-    else:
-        print padded_str
+    Later files take precedence over earlier ones, and missing files are
+    ignored. Raises ValueError if a file cannot be parsed.
+    """
+    fnames = [fname for fname in fnames if os.path.exists(fname)]
+    if not fnames:
+        return {}
+
+    from ConfigParser import Error, RawConfigParser
+
+    parser = RawConfigParser()
+    try:
+        parser.read(fnames)
+    except Error as e:
+        raise ValueError(str(e))
+    if not parser.has_section('draftcheck'):
+        return {}
+    return dict(parser.items('draftcheck'))
+
+
+def split_names(text):
+    """Split a comma separated list of rule ids or names."""
+    return [name.strip() for name in text.split(',') if name.strip()]
+
+
+def chunk_limit(max_chunk_length, whole_document=False):
+    """Return the `max_chunk_length` of validators, given the option.
+
+    The option is 0 to never skip rules, or None for the default. By default,
+    rules are only skipped on long chunks when checking line by line, where
+    long lines are validated in windows anyway: whole documents routinely
+    have long chunks, and skipping rules on them would hide mistakes.
+    """
+    if max_chunk_length is None:
+        return None if whole_document else MAX_CHUNK_LENGTH
+    return max_chunk_length or None
+
+
+def add_rule_options(parser):
+    """Add the options choosing the rules and how they are checked.
+
+    These are shared by `draftcheck` and its subcommands, and are resolved
+    with `apply_rule_options`.
+    """
+    parser.add_argument('--select',
+                        help='Comma separated ids or names of the only rules '
+                             'to check')
+    parser.add_argument('--ignore',
+                        help='Comma separated ids or names of rules not to '
+                             'check')
+    parser.add_argument('--config', action='append',
+                        help='Configuration file with a [draftcheck] section '
+                             'giving select and ignore options. Defaults to '
+                             + ', '.join(CONFIG_FILES))
+    parser.add_argument('--single-pass', action='store_true',
+                        help='Check all rules in a single pass over each '
+                             'chunk of text')
+    parser.add_argument('--lexer', action='store_true',
+                        help='Lex each file to track environments anywhere '
+                             'on a line and to leave out comments, verbatim '
+                             'text and the arguments of commands like \\ref')
+    parser.add_argument('--max-chunk-length', type=int,
+                        help='Skip rules that may be slow on chunks of text '
+                             'longer than this, or 0 to never skip them. '
+                             'Defaults to {0}, or to 0 for whole '
+                             'documents'.format(MAX_CHUNK_LENGTH))
+
+
+def apply_rule_options(parser, args):
+    """Select the rules given by the options of `add_rule_options`.
+
+    Options given on the command line take precedence over the
+    configuration files. Errors are reported through `parser`.
+
+    Returns
+    -------
+    select, ignore : list of string
+        The names given to `rules.select_rules`, to select the same rules in
+        other processes.
+    """
+    try:
+        config = read_config(args.config or CONFIG_FILES)
+    except ValueError as e:
+        parser.error('cannot read the configuration: {0}'.format(e))
+
+    select = args.select or config.get('select')
+    ignore = args.ignore or config.get('ignore')
+    select = split_names(select) if select else None
+    ignore = split_names(ignore) if ignore else None
+
+    # A typo would otherwise silently check nothing
+    unknown = unknown_names((select or []) + (ignore or []))
+    if unknown:
+        parser.error('unknown rules: {0}'.format(', '.join(unknown)))
+
+    select_rules(select, ignore)
+    return select, ignore
+
+
+def validate_stream(lines, validator=None, resume=None, encoding='utf-8',
+                    **kwargs):
+    """Yield the violations in a stream of lines as they are found.
+
+    Lines are read one at a time and nothing is kept once they are checked,
+    so that arbitrarily long streams, such as pipes, are checked in constant
+    memory.
+
+    Parameters
+    ----------
+    lines : file or iterable of string
+        The lines to check. Files are read line by line as they become
+        available, rather than in blocks. Lines longer than
+        `validator.WINDOW_SIZE` are read and validated in windows, see
+        `Validator.validate_windows`.
+    validator : validator.Validator, optional
+        The validator to check the lines with. If not given, one is created
+        with the other keyword arguments, such as `single_pass`.
+    resume : dict, optional
+        Maps line numbers to the environment stack the validator continues
+        with after those lines, such as after lines including other files.
+    encoding : string, optional
+        The encoding unicode lines are encoded with before being checked.
+        Byte strings are checked as they are, so that spans count bytes
+        whether or not the lines are decoded.
+
+    Yields
+    ------
+    violation : (lineno, line, span, rule_id)
+        Compact records of the violations, in the order they are found. The
+        line is stripped of surrounding whitespace, as it is printed. Long
+        lines are not kept whole, and a `validator.Excerpt` of the line
+        around the violation is recorded instead.
+    """
+    if validator is None:
+        validator = Validator(**kwargs)
+
+    for lineno, line in _iter_lines(lines, validator, resume, encoding):
+        if isinstance(line, str):
+            for rule, span in validator.validate(line):
+                yield (lineno, line.strip(), span, rule.id)
+        else:
+            for rule, span, excerpt in validator.validate_windows(line):
+                yield (lineno, excerpt, span, rule.id)
+
+
+def _iter_lines(lines, validator, resume, encoding='utf-8'):
+    """Yield the lines to validate, as `validate_stream` is given them.
+
+    Lines too long to validate whole are yielded as an iterator over their
+    pieces. The environment stack of the validator is reset as given by
+    `resume` once each line has been validated.
+    """
+    if hasattr(lines, 'readline'):
+        # Iterating over files reads ahead, holding back lines from pipes
+        lines = _read_lines(lines.readline)
+
+    for lineno, line in enumerate(lines):
+        if isinstance(line, unicode):
+            line = line.encode(encoding)
+
+        if isinstance(line, str) and len(line) <= WINDOW_SIZE:
+            yield lineno, line
+        elif isinstance(line, str):
+            yield lineno, (line[i:i + WINDOW_SIZE]
+                           for i in xrange(0, len(line), WINDOW_SIZE))
+        else:
+            yield lineno, (piece.encode(encoding)
+                           if isinstance(piece, unicode) else piece
+                           for piece in line)
+
+        if resume and lineno in resume:
+            validator.reset(resume[lineno])
+
+
+def _read_lines(readline):
+    """Read lines, or the pieces of lines too long to read whole."""
+    while True:
+        piece = readline(WINDOW_SIZE)
+        if not piece:
+            return
+        if len(piece) < WINDOW_SIZE or piece.endswith('\n'):
+            yield piece
+        else:
+            yield _read_pieces(readline, piece)
+
+
+def _read_pieces(readline, piece):
+    """Read the rest of a long line, starting with its first piece."""
+    while piece:
+        yield piece
+        if len(piece) < WINDOW_SIZE or piece.endswith('\n'):
+            return
+        piece = readline(WINDOW_SIZE)
+
+
+def check_lines(lines, validator, resume=None, sink=list):
+    """Find the violations in an iterable of lines.
+
+    If given, `resume` maps line numbers to the environment stack the
+    validator continues with after those lines, such as after lines including
+    other files.
+
+    Parameters
+    ----------
+    sink : callable, optional
+        Called with an iterable of the records of the violations as they are
+        found, returning the result. By default, the records are returned as
+        a list. Use `count_violations` to only count them: the lines are then
+        counted with `Validator.count`, without building any records.
+
+    Returns
+    -------
+    violations : list of (lineno, line, span, rule_id)
+        The records yielded by `validate_stream`, or what `sink` returns.
+    """
+    if sink is count_violations:
+        return _count_lines(lines, validator, resume)
+    return sink(validate_stream(lines, validator, resume))
+
+
+def _new_counts():
+    return array.array('l', [0]) * (len(RULES_LIST) + 1)
+
+
+def count_violations(violations):
+    """Count the violations of each rule, as a sink of `check_lines`.
+
+    Returns
+    -------
+    counts : array.array
+        The number of violations of each rule, indexed by rule id.
+    """
+    counts = _new_counts()
+    for violation in violations:
+        counts[violation[3]] += 1
+    return counts
+
+
+def _count_lines(lines, validator, resume=None):
+    """Count the violations `check_lines` finds, see `count_violations`."""
+    counts = _new_counts()
+    for lineno, line in _iter_lines(lines, validator, resume):
+        if isinstance(line, str):
+            validator.count(line, counts)
+        else:
+            for rule, span, excerpt in validator.validate_windows(line):
+                counts[rule.id] += 1
+    return counts
+
+
+def check_document(text, validator, sink=list):
+    """Find the violations in a document, validating it as a whole.
+
+    Violations spanning several lines are reported on the line they start on,
+    with the span cut off at the end of that line. The validator must be
+    fresh, as the document is validated from its start. See `check_lines`
+    for `sink`.
+
+    Returns
+    -------
+    violations : list of (lineno, line, span, rule_id)
+        The same records as `check_lines`, ordered by line.
+    """
+    violations = []
+    index = LineIndex(text)
+    for rule, span in validator.validate_document(text):
+        lineno, column = index.locate(span[0])
+        line_start, line_end = index.line_span(lineno)
+        end = min(span[1], line_end) - line_start
+        violations.append((lineno, text[line_start:line_end].strip(),
+                           (column, end), rule.id))
+
+    # Report the violations line by line, as when validating line by line
+    violations.sort(key=lambda violation: violation[0])
+    return sink(violations)
+
+
+def check_stream(stream, sink=list, **kwargs):
+    """Find the violations in a stream, validating it as a whole.
+
+    The stream has to be read to its end first. Other keyword arguments are
+    passed on to `Validator`.
+    """
+    return check_document(stream.read(), Validator(**kwargs), sink)
+
+
+def check_file(fname, whole_document=False, cache=None, resume=None,
+               sink=list, **kwargs):
+    """Find the violations in a file.
+
+    Other keyword arguments, such as `single_pass`, `envs` or `profile`, are
+    passed on to `Validator`.
+
+    Parameters
+    ----------
+    fname : string
+        The name of the file to check.
+    whole_document : boolean, optional
+        Whether to validate the file as a whole rather than line by line. Large
+        files are then memory-mapped rather than read into memory.
+    cache : cache.Cache, optional
+        If given, the violations are looked up in the cache by the contents of
+        the file, and stored there when the file has to be checked.
+    resume : dict, optional
+        The environment stacks to continue with after some lines, see
+        `check_lines`. Files can only be validated line by line when given.
+    sink : callable, optional
+        Called with the records of the violations, see `check_lines`. The
+        cache holds the records, whatever the sink.
+
+    Returns
+    -------
+    violations : list of (lineno, line, span, rule_id)
+        The records returned by `check_lines`, or what `sink` returns.
+    """
+    validator = Validator(**kwargs)
 
-    print ' ' * (len(prefix) + start_index + 1) + '^' * (span[1] - span[0])
-    print "\t[{0:03d}]".format(rule.id), get_brief(rule)
-    print
+    with open(fname, 'r') as infile:
+        if (whole_document and
+                os.fstat(infile.fileno()).st_size >= MMAP_THRESHOLD):
+            import mmap
+            content = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        elif whole_document or cache is not None:
+            content = infile.read()
+        else:
+            return check_lines(infile, validator, resume, sink)
+
+    # Memory maps are hashed and validated without reading them into memory
+    try:
+        if cache is not None:
+            key = cache.key(content, whole_document,
+                            kwargs.get('max_chunk_length'),
+                            kwargs.get('lexer'), kwargs.get('envs'),
+                            sorted((resume or {}).items()))
+            violations = cache.get(key)
+            if violations is not None:
+                return sink(violations)
+
+        if whole_document:
+            violations = check_document(content, validator)
+        else:
+            violations = check_lines(StringIO(content), validator, resume)
+
+        if cache is not None:
+            cache.put(key, violations)
+        return sink(violations)
+    finally:
+        if not isinstance(content, str):
+            content.close()
+
+
+def check_chunk(fname, checkpoint, end, cache=None, sink=list, **kwargs):
+    """Find the violations in the lines of a file between two offsets.
+
+    The chunk starts at a checkpoint found by `validator.find_checkpoints`,
+    and the records returned are the same as those `check_file` returns for
+    the lines in the chunk. See `check_file` for `sink`.
+    """
+    with open(fname, 'r') as infile:
+        infile.seek(checkpoint.offset)
+        content = infile.read(end - checkpoint.offset)
+
+    if cache is not None:
+        key = cache.key(content, False, kwargs.get('max_chunk_length'),
+                        kwargs.get('lexer'), checkpoint.lineno,
+                        checkpoint.envs)
+        violations = cache.get(key)
+        if violations is not None:
+            return sink(violations)
+
+    validator = Validator.from_checkpoint(checkpoint, **kwargs)
+    if cache is None and sink is count_violations:
+        # Counts do not depend on where the lines are in the file
+        return check_lines(StringIO(content), validator, sink=sink)
+
+    violations = ((lineno + checkpoint.lineno, line, span, rule_id)
+                  for lineno, line, span, rule_id
+                  in validate_stream(StringIO(content), validator))
+    if cache is None:
+        return sink(violations)
+
+    violations = list(violations)
+    cache.put(key, violations)
+    return sink(violations)
+
+
+def split_file(fname, chunk_size, lexer=False):
+    """Return the (checkpoint, end) pairs of chunks to check a file in."""
+    import mmap
+
+    with open(fname, 'r') as infile:
+        text = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            checkpoints = find_checkpoints(text, chunk_size, lexer)
+            ends = [c.offset for c in checkpoints[1:]] + [len(text)]
+        finally:
+            text.close()
+    return zip(checkpoints, ends)
+
+
+def _add_chunks(reports, continued):
+    """Add up the counts of the chunks of each file split between tasks.
+
+    Parameters
+    ----------
+    reports : iterable of (fname, counts)
+        The results of the tasks, in order.
+    continued : set of int
+        The indices of the tasks which check the chunks of a file after its
+        first one.
+    """
+    pending = None
+    for index, (fname, counts) in enumerate(reports):
+        if index in continued:
+            for rule_id, count in enumerate(counts):
+                pending[1][rule_id] += count
+            continue
+        if pending is not None:
+            yield pending
+        pending = fname, counts
+    if pending is not None:
+        yield pending
+
+
+def _expand_archives(reports):
+    """Yield the results of the files in archives as those of other files."""
+    from archive import is_archive
+
+    for fname, result in reports:
+        if is_archive(fname):
+            for member in result:
+                yield member
+        else:
+            yield fname, result
+
+
+def _call(task):
+    return task()
+
+
+def _call_profiled(task):
+    from profiling import RuleProfile
+
+    # Streams are consumed here, so that the rules have run before the
+    # profile is sent back
+    profile = RuleProfile()
+    return list(task(profile=profile)), profile.stats
 
 
 def main():
     import argparse
 
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from service import main as serve
+        return serve(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        from shard import main as merge
+        return merge(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'history':
+        from history import main as history
+        return history(sys.argv[2:])
+
     parser = argparse.ArgumentParser(
-        description='Check for common mistakes in LaTeX documents.')
+        description='Check for common mistakes in LaTeX documents.',
+        epilog='Run "draftcheck serve --help" to check documents sent over '
+               'HTTP instead, "draftcheck merge --help" to merge the '
+               'reports of several shards, and "draftcheck history --help" '
+               'to count mistakes across a git history.')
 
-    parser.add_argument('filenames', action='append',
-                        help='List of filenames to check')
+    parser.add_argument('filenames', nargs='*',
+                        help='List of filenames to check, or - to check the '
+                             'standard input. The .tex files in .tar.gz, '
+                             '.tar, .tar.bz2 and .zip archives are checked '
+                             'without extracting them')
+    parser.add_argument('--files-from', metavar='FILE',
+                        help='Also check the files listed in FILE, one per '
+                             'line')
+    parser.add_argument('--shard', metavar='I/N',
+                        help='Only check the I-th of N shards of the files, '
+                             'balanced by size, to split a run between '
+                             'machines')
+    parser.add_argument('--root', action='append', default=[],
+                        help='Check a document and every file it includes, '
+                             'checking shared files only once. May be given '
+                             'several times')
+    add_rule_options(parser)
+    parser.add_argument('--whole-document', action='store_true',
+                        help='Check each file as a whole rather than line by '
+                             'line, finding mistakes that span several lines')
+    parser.add_argument('--diff', metavar='BASE',
+                        help='Only report mistakes on the lines changed since '
+                             'the git revision BASE, in the given files or '
+                             'in every changed .tex file')
+    parser.add_argument('--fix', action='store_true',
+                        help='Fix the mistakes that can be fixed mechanically '
+                             'in place, reporting the others')
+    parser.add_argument('--summary', action='store_true',
+                        help='Only report the number of mistakes of each '
+                             'rule in each file, in the human or jsonl '
+                             'format')
+    parser.add_argument('--cache-dir',
+                        help='Directory in which to cache results for files '
+                             'that have not changed')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Check every file without using the cache')
+    parser.add_argument('--watch', metavar='DIR',
+                        help='Check the .tex files in a directory whenever '
+                             'they change, reporting new and resolved '
+                             'mistakes, until interrupted')
+    parser.add_argument('--lsp', action='store_true',
+                        help='Run a language server over stdin and stdout')
+    parser.add_argument('--profile-rules', choices=['table', 'json'],
+                        help='Report the time spent in each rule and the '
+                             'amount of text it scanned, without using the '
+                             'cache')
+    parser.add_argument('--audit-rules', action='store_true',
+                        help='Time the rules on pathological inputs and '
+                             'report those that scale badly')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='human',
+                        help='Format to report mistakes in')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of files to check in parallel')
 
     args = parser.parse_args()
 
-    # Count the total number of errors
-    num_errors = 0
+    select, ignore = apply_rule_options(parser, args)
+
+    if args.lsp:
+        from lsp import LanguageServer
+        return LanguageServer(
+            single_pass=args.single_pass, lexer=args.lexer,
+            max_chunk_length=chunk_limit(args.max_chunk_length)).serve()
+
+    if args.audit_rules:
+        import guard
+        print guard.format_audit(guard.audit())
+        return 0
+
+    from archive import check_archive, is_archive
+
+    if args.files_from:
+        with open(args.files_from, 'r') as infile:
+            args.filenames.extend(line.strip() for line in infile
+                                  if line.strip())
+
+    if not args.filenames and not args.root and not (args.watch or
+                                                     args.diff):
+        parser.error('too few arguments')
+    if args.root and args.whole_document:
+        parser.error('--root cannot be used with --whole-document')
+    if args.fix and (args.whole_document or '-' in args.filenames or
+                     any(is_archive(fname) for fname in args.filenames)):
+        parser.error('--fix cannot be used with --whole-document, - or '
+                     'archives')
+    if args.diff and (args.whole_document or args.root or args.fix or
+                      '-' in args.filenames):
+        parser.error('--diff cannot be used with --whole-document, --root, '
+                     '--fix or -')
+
+    if args.watch and (args.filenames or args.root or args.diff or
+                       args.summary or args.fix or args.format != 'human'):
+        parser.error('--watch cannot be used with filenames, --root, --diff, '
+                     '--summary, --fix or --format')
+
+    if args.shard:
+        if args.root or args.diff or '-' in args.filenames:
+            parser.error('--shard cannot be used with --root, --diff or -')
+        import shard
+        try:
+            index, count = shard.parse_shard(args.shard)
+        except ValueError as e:
+            parser.error('--shard: {0}'.format(e))
+        args.filenames = shard.shard_files(args.filenames, index, count)
+
+    if args.summary:
+        if args.fix or args.diff or args.profile_rules:
+            parser.error('--summary cannot be used with --fix, --diff or '
+                         '--profile-rules')
+        if args.format not in SUMMARY_WRITERS:
+            parser.error('--summary cannot be used with --format {0}'.format(
+                args.format))
+
+    # Profiling is only meaningful when the rules are actually run, and
+    # summaries stream the files rather than reading them whole to cache them
+    if args.no_cache or args.profile_rules or args.summary:
+        cache = None
+    else:
+        from cache import Cache
+        cache = Cache(args.cache_dir)
+
+    options = {'single_pass': args.single_pass, 'cache': cache,
+               'max_chunk_length': chunk_limit(args.max_chunk_length,
+                                               args.whole_document),
+               'lexer': args.lexer}
+
+    if args.watch:
+        from watch import Watcher
+        return Watcher(args.watch, functools.partial(
+            check_file, whole_document=args.whole_document,
+            **options), cache=cache).run()
+
+    # Each task checks a file, or a chunk of a file large enough to be split
+    # between several processes. They are listed in the order of the output.
+    # Fixing files checks them whole, and reports what could not be fixed
+    # Summaries only keep the number of violations of each rule
+    sink = count_violations if args.summary else list
+    if args.fix:
+        from autofix import fix_file
+        check = fix_file
+    else:
+        check = functools.partial(check_file, sink=sink)
+
+    tasks = []
+    # The indices of the tasks checking the chunks of a file after its first
+    continued = set()
+    if args.diff:
+        import gitdiff
+        try:
+            changed = gitdiff.changed_ranges(args.diff, args.filenames)
+        except (gitdiff.GitError, OSError) as e:
+            parser.error('cannot diff against {0}: {1}'.format(args.diff, e))
+
+        # Only the changed lines are checked, and the named files are
+        # already among them
+        for fname, ranges in changed.items():
+            tasks.append((fname, functools.partial(
+                gitdiff.check_ranges, fname, ranges, **options)))
+        args.filenames = []
+
+    if args.root:
+        # Files included by the documents start in the environment they are
+        # included in, and can all be checked independently
+        from project import Project
+        project = Project(args.root, args.lexer)
+        for path, lineno, name in project.missing:
+            print >> sys.stderr, '{0}:{1}: cannot find included file {2}' \
+                .format(path, lineno, name)
+        for path, (envs, resume) in project.files.items():
+            tasks.append((path, functools.partial(
+                check, path, envs=envs, resume=resume, **options)))
 
     for fname in args.filenames:
-        with open(fname, 'r') as infile:
-            validator = Validator()
-            for lineno, line in enumerate(infile):
-                for rule, span in validator.validate(line):
-                    print_warning(fname, lineno, line.strip(), span, rule, args)
-                    num_errors += 1
-
-    if num_errors > 0:
-        print '\nTotal of {0} mistakes found.'.format(num_errors)
-        return 1
+        if fname == '-':
+            # The standard input is checked, and reported, as it is read
+            validator_options = dict(options)
+            del validator_options['cache']
+            if args.whole_document:
+                task = functools.partial(check_stream, sys.stdin, sink,
+                                         **validator_options)
+            elif args.summary:
+                task = functools.partial(check_lines, sys.stdin,
+                                         Validator(**validator_options),
+                                         sink=sink)
+            else:
+                task = functools.partial(validate_stream, sys.stdin,
+                                         **validator_options)
+            tasks.append((STDIN_NAME, task))
+        elif is_archive(fname):
+            # Archives are read whole by a single process, but many archives
+            # can be read at once
+            tasks.append((fname, functools.partial(
+                check_archive, fname, whole_document=args.whole_document,
+                sink=sink, **options)))
+        elif (args.jobs > 1 and not args.whole_document and not args.fix and
+                os.path.getsize(fname) >= 2 * CHUNK_SIZE):
+            chunks = split_file(fname, CHUNK_SIZE, args.lexer)
+            continued.update(xrange(len(tasks) + 1, len(tasks) + len(chunks)))
+            tasks.extend((fname, functools.partial(check_chunk, fname,
+                                                   checkpoint, end, sink=sink,
+                                                   **options))
+                         for checkpoint, end in chunks)
+        elif args.fix:
+            tasks.append((fname, functools.partial(check, fname, **options)))
+        else:
+            tasks.append((fname, functools.partial(
+                check, fname, whole_document=args.whole_document,
+                **options)))
+
+    pool = None
+    # The standard input can only be read by this process
+    if args.jobs > 1 and len(tasks) > 1 and '-' not in args.filenames:
+        import multiprocessing
+
+        # Each worker imports the rules once and sends back compact records,
+        # which are received in the original order of the tasks
+        pool = multiprocessing.Pool(min(args.jobs, len(tasks)),
+                                    select_rules, (select, ignore))
+        results = pool.imap(_call_profiled if args.profile_rules else _call,
+                            [task for _, task in tasks])
+    elif args.profile_rules:
+        results = (_call_profiled(task) for _, task in tasks)
     else:
-        print 'No mistakes found.'
-        return 0
\ No newline at end of file
+        results = (task() for _, task in tasks)
+
+    if args.profile_rules:
+        from profiling import RuleProfile
+
+        profile = RuleProfile()
+
+        def merged(results):
+            for violations, stats in results:
+                profile.merge(stats)
+                yield violations
+        results = merged(results)
+
+    num_fixed = [0, 0]
+    if args.fix:
+        def fixed(results):
+            for count, violations in results:
+                num_fixed[0] += count
+                num_fixed[1] += count > 0
+                yield violations
+        results = fixed(results)
+
+    # Report mistakes in the standard input as soon as they are found
+    if args.summary:
+        writer = SUMMARY_WRITERS[args.format](sys.stdout)
+    elif '-' in args.filenames:
+        writer = WRITERS[args.format](sys.stdout, buffer_size=0)
+    else:
+        writer = WRITERS[args.format](sys.stdout)
+    writer.begin()
+
+    # Count the total number of errors. Chunks on which rules were skipped
+    # are reported, but are not mistakes
+    num_errors = 0
+
+    try:
+        reports = itertools.izip((fname for fname, _ in tasks), results)
+        if args.summary:
+            # The chunks of a file are counted together
+            for fname, counts in _expand_archives(_add_chunks(reports,
+                                                              continued)):
+                counts = dict((rule_id, count)
+                              for rule_id, count in enumerate(counts)
+                              if count)
+                if counts:
+                    writer.counts(fname, counts)
+                    num_errors += sum(count for rule_id, count
+                                      in counts.items()
+                                      if rule_id != skipped_rule.id)
+        else:
+            for fname, violations in _expand_archives(reports):
+                for lineno, line, span, rule_id in violations:
+                    writer.violation(fname, lineno, line, span,
+                                     get_rule(rule_id))
+                    if rule_id != skipped_rule.id:
+                        num_errors += 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    writer.end(num_errors)
+
+    if args.fix:
+        print >> sys.stderr, 'Fixed {0} mistakes in {1} files.'.format(
+            *num_fixed)
+
+    if cache is not None:
+        cache.prune()
+
+    if args.profile_rules == 'table':
+        print >> sys.stderr, profile.format_table()
+    elif args.profile_rules == 'json':
+        print >> sys.stderr, profile.format_json()
+
+    return 1 if num_errors > 0 else 0
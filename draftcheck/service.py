@@ -0,0 +1,309 @@
+"""This module contains a local service checking documents sent over HTTP.
+
+Documents are checked by a pool of worker processes which keep the rules
+compiled between requests, so that checking many small documents does not
+pay for starting the interpreter each time. Run it with `draftcheck serve`.
+
+    POST /check  {"text": "..."}
+        Check a single document, returning {"violations": [...]}.
+    POST /check  {"documents": [{"text": "...", "id": ...}, ...]}
+        Check a batch of documents, returning {"results": [...]} in the same
+        order, each with the id given for the document, if any.
+    GET /stats
+        Report counters of the requests served so far.
+
+Either request may set "whole_document" to validate documents as a whole.
+Violations are the objects of `output.violation_record`, with columns
+counting bytes of the UTF-8 encoded text. When more documents are pending
+than the service allows, requests are turned away with 503 and should be
+retried later.
+"""
+
+import BaseHTTPServer
+import SocketServer
+import collections
+import json
+import multiprocessing
+import sys
+import threading
+import time
+
+from cStringIO import StringIO
+
+from draftcheck import __version__
+from output import violation_record
+from rules import RULES_LIST, get_rule, is_selected, select_rules
+from script import (add_rule_options, apply_rule_options, check_document,
+                    check_lines, chunk_limit)
+from validator import Validator
+
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 16 << 20
+
+
+def _init_worker(select, ignore):
+    """Select the rules of a worker and compile them ahead of requests."""
+    select_rules(select, ignore)
+    for r in RULES_LIST:
+        if is_selected(r):
+            r.regexpr
+
+
+def check_text(job):
+    """Check a document in a worker, given (text, whole_document, options).
+
+    Returns
+    -------
+    violations : list of dict
+        The violations found, as given by `output.violation_record`.
+    """
+    text, whole_document, options = job
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+
+    options = dict(options, max_chunk_length=chunk_limit(
+        options.get('max_chunk_length'), whole_document))
+    validator = Validator(**options)
+    if whole_document:
+        violations = check_document(text, validator)
+    else:
+        violations = check_lines(StringIO(text), validator)
+    return [violation_record(lineno, span, get_rule(rule_id))
+            for lineno, line, span, rule_id in violations]
+
+
+class Stats(object):
+    """Counters of the requests served, safe to update from many threads.
+
+    Parameters
+    ----------
+    window : int, optional
+        The number of most recent requests latencies are reported over.
+    """
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.start = time.time()
+        self.requests = 0
+        self.documents = 0
+        self.violations = 0
+        self.rejected = 0
+        self.errors = 0
+        self.pending = 0
+        self.latencies = collections.deque(maxlen=window)
+
+    def acquire(self, count, limit):
+        """Count `count` more pending documents, unless over `limit`."""
+        with self._lock:
+            if self.pending > 0 and self.pending + count > limit:
+                self.rejected += 1
+                return False
+            self.pending += count
+            return True
+
+    def release(self, count, violations, seconds, error=False):
+        """Record a request of `count` documents once it is served."""
+        with self._lock:
+            self.pending -= count
+            self.requests += 1
+            if error:
+                self.errors += 1
+                return
+            self.documents += count
+            self.violations += violations
+            self.latencies.append(seconds)
+
+    def as_dict(self):
+        with self._lock:
+            uptime = time.time() - self.start
+            latencies = sorted(self.latencies)
+            stats = {
+                'uptime': uptime,
+                'requests': self.requests,
+                'documents': self.documents,
+                'violations': self.violations,
+                'rejected': self.rejected,
+                'errors': self.errors,
+                'pending': self.pending,
+                'documents_per_second': self.documents / max(uptime, 1e-9),
+            }
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1,
+                                 int(len(latencies) * p))] * 1000
+
+        if latencies:
+            stats['latency_ms'] = {
+                'mean': sum(latencies) / len(latencies) * 1000,
+                'p50': percentile(0.5),
+                'p90': percentile(0.9),
+                'p99': percentile(0.99),
+                'max': latencies[-1] * 1000,
+            }
+        return stats
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    server_version = 'draftcheck/' + __version__
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body, headers=()):
+        content = json.dumps(body, sort_keys=True)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.reply(200, self.server.service.stats.as_dict())
+        else:
+            self.reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/check':
+            return self.reply(404, {'error': 'not found'})
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_SIZE:
+            return self.reply(413, {'error': 'request too large'})
+        try:
+            request = json.loads(self.rfile.read(length))
+            batch = 'documents' in request
+            documents = request['documents'] if batch else [request]
+            texts = [document['text'] for document in documents]
+            if not all(isinstance(text, basestring) for text in texts):
+                raise TypeError('texts must be strings')
+        except (ValueError, TypeError, KeyError):
+            return self.reply(400, {'error': 'expected {"text": ...} or '
+                                             '{"documents": [...]}'})
+
+        service = self.server.service
+        try:
+            results = service.check(texts,
+                                    bool(request.get('whole_document')))
+        except Exception as e:
+            return self.reply(500, {'error': 'cannot check the documents: '
+                                             '{0!r}'.format(e)})
+        if results is None:
+            return self.reply(503, {'error': 'too many pending documents'},
+                              [('Retry-After', '1')])
+
+        if not batch:
+            return self.reply(200, {'violations': results[0]})
+        replies = []
+        for document, violations in zip(documents, results):
+            replies.append({'violations': violations})
+            if 'id' in document:
+                replies[-1]['id'] = document['id']
+        self.reply(200, {'results': replies})
+
+
+class HTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class UnixHTTPServer(SocketServer.ThreadingMixIn,
+                     SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+class Service(object):
+    """Check documents with a pool of warm worker processes.
+
+    Parameters
+    ----------
+    jobs : int, optional
+        The number of worker processes.
+    max_pending : int, optional
+        The number of documents which may be waiting to be checked before
+        requests are turned away. A single request is always accepted when
+        nothing else is pending, however large.
+    select, ignore : list of string, optional
+        The rules to check in the workers, see `rules.select_rules`.
+    options : dict, optional
+        Keyword arguments for the `Validator` of each document, with
+        `max_chunk_length` given as to `script.chunk_limit`.
+    """
+
+    def __init__(self, jobs=1, max_pending=1000, select=None, ignore=None,
+                 options=None):
+        self.max_pending = max_pending
+        self.options = options or {}
+        self.stats = Stats()
+        self.pool = multiprocessing.Pool(jobs, _init_worker, (select, ignore))
+        self.jobs = jobs
+
+    def check(self, texts, whole_document=False):
+        """Check documents, or return None if too many are pending."""
+        if not self.stats.acquire(len(texts), self.max_pending):
+            return None
+
+        start = time.time()
+        jobs = [(text, whole_document, self.options) for text in texts]
+        try:
+            # Small documents are sent to the workers in batches
+            results = self.pool.map(check_text, jobs,
+                                    max(1, len(jobs) // (4 * self.jobs)))
+        except Exception:
+            self.stats.release(len(texts), 0, 0, error=True)
+            raise
+        self.stats.release(len(texts), sum(len(r) for r in results),
+                           time.time() - start)
+        return results
+
+    def serve(self, address):
+        """Serve requests on a (host, port) pair or a Unix socket path."""
+        if isinstance(address, tuple):
+            server = HTTPServer(address, Handler)
+        else:
+            server = UnixHTTPServer(address, Handler)
+        server.service = self
+        self.server = server
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.pool.terminate()
+        return 0
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='draftcheck serve',
+        description='Check documents sent over HTTP with warm workers.')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='Port to listen on')
+    parser.add_argument('--socket',
+                        help='Listen on a Unix socket at this path instead')
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of worker processes')
+    parser.add_argument('--max-pending', type=int, default=1000,
+                        help='Number of documents waiting to be checked '
+                             'before requests are turned away')
+    add_rule_options(parser)
+
+    args = parser.parse_args(argv)
+    select, ignore = apply_rule_options(parser, args)
+
+    service = Service(args.jobs, args.max_pending, select, ignore, {
+        'single_pass': args.single_pass, 'lexer': args.lexer,
+        'max_chunk_length': args.max_chunk_length})
+
+    address = args.socket or (args.host, args.port)
+    print >> sys.stderr, 'Serving on {0} with {1} workers'.format(
+        address if args.socket else 'http://{0}:{1}'.format(*address),
+        args.jobs)
+    return service.serve(address)
@@ -0,0 +1,208 @@
+"""This module contains code to split runs between machines and merge them.
+
+Each machine checks one shard of the files, given by `--shard I/N`, writing
+its report with `--format jsonl`. The reports are then combined with
+
+    draftcheck merge shard-1.jsonl shard-2.jsonl ...
+
+which writes the violations of every shard as a single report, along with the
+number of violations of each rule, and exits as `draftcheck` itself would
+have on all the files. Reports written with `--summary --format jsonl` are
+merged the same way, into a single summary.
+"""
+
+import json
+import os
+import sys
+
+from output import SUMMARY_WRITERS, WRITERS, format_counts
+from rules import RULES_LIST, get_rule, skipped_rule
+
+
+def parse_shard(text):
+    """Parse a shard given as 'I/N', returning (I, N) with 1 <= I <= N."""
+    try:
+        index, count = [int(part) for part in text.split('/')]
+    except ValueError:
+        raise ValueError('expected I/N, such as 1/4')
+    if not 1 <= index <= count:
+        raise ValueError('expected 1 <= I <= N')
+    return index, count
+
+
+def shard_files(fnames, index, count):
+    """Return the files of one shard out of `count`, balanced by size.
+
+    Files are handed out largest first, each to the shard with the least
+    data so far, so that every machine given the same list of files, and
+    seeing the same sizes, splits it the same way. Files that cannot be found
+    count as empty.
+
+    Parameters
+    ----------
+    fnames : list of string
+        All the files, in any order.
+    index, count : int
+        The shard to return, counting from 1, and the number of shards.
+
+    Returns
+    -------
+    fnames : list of string
+        The files of the shard, in the order they were given.
+    """
+    sizes = {}
+    for fname in fnames:
+        try:
+            sizes[fname] = os.path.getsize(fname)
+        except OSError:
+            sizes[fname] = 0
+
+    totals = [0] * count
+    shard = set()
+    for fname in sorted(sizes, key=lambda fname: (-sizes[fname], fname)):
+        smallest = totals.index(min(totals))
+        totals[smallest] += sizes[fname]
+        if smallest == index - 1:
+            shard.add(fname)
+
+    # Files given several times are only checked once
+    result = []
+    for fname in fnames:
+        if fname in shard:
+            result.append(fname)
+            shard.remove(fname)
+    return result
+
+
+def _check_rule(rule_id):
+    return (isinstance(rule_id, int) and
+            skipped_rule.id <= rule_id <= len(RULES_LIST))
+
+
+def _is_violation(record):
+    """Return whether a record describes a violation, as `--format jsonl`."""
+    return (isinstance(record.get('file'), basestring) and
+            all(isinstance(record.get(key), int)
+                for key in ['line', 'column', 'end_column']) and
+            _check_rule(record.get('rule')))
+
+
+def _is_counts(record):
+    """Return whether a record gives the counts of a file, as `--summary`."""
+    counts = record.get('counts')
+    return (isinstance(record.get('file'), basestring) and
+            isinstance(counts, dict) and
+            all(key.isdigit() and _check_rule(int(key)) and
+                isinstance(count, int) for key, count in counts.items()))
+
+
+def read_reports(fnames):
+    """Read the records of reports written with `--format jsonl`.
+
+    The reports either all list violations, or all give the number of
+    violations of each rule in each file, as written with `--summary`.
+
+    Returns
+    -------
+    violations : list of dict
+        The violations of every report, ordered by file, line and column.
+    counts : list of (string, dict)
+        Each file of every summary, in order, with a dict mapping the ids of
+        the rules violated in it to their number of violations. The counts
+        of a file found in several summaries are added up.
+
+    Raises
+    ------
+    ValueError
+        If a record is neither a violation nor the counts of a file, or if
+        summaries are merged with reports of violations.
+    """
+    violations = []
+    counts = {}
+    for fname in fnames:
+        with open(fname, 'r') as infile:
+            for lineno, line in enumerate(infile):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict):
+                    raise ValueError('{0}:{1}: not a JSON object'.format(
+                        fname, lineno))
+
+                if _is_violation(record):
+                    violations.append(record)
+                elif _is_counts(record):
+                    totals = counts.setdefault(record['file'], {})
+                    for key, count in record['counts'].items():
+                        totals[int(key)] = totals.get(int(key), 0) + count
+                else:
+                    raise ValueError('{0}:{1}: neither a violation nor the '
+                                     'counts of a file'.format(fname, lineno))
+
+    if violations and counts:
+        raise ValueError('cannot merge summaries with reports of violations')
+
+    violations.sort(key=lambda v: (v['file'], v['line'], v['column'],
+                                   v['rule']))
+    return violations, sorted(counts.items())
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='draftcheck merge',
+        description='Merge the reports of runs on shards of the files.')
+    parser.add_argument('reports', nargs='+',
+                        help='Reports written with --format jsonl')
+    parser.add_argument('--format', choices=['jsonl', 'sarif'],
+                        default='jsonl',
+                        help='Format to write the merged report in')
+
+    args = parser.parse_args(argv)
+
+    try:
+        violations, counts = read_reports(args.reports)
+    except (IOError, ValueError) as e:
+        parser.error(str(e))
+
+    if counts:
+        if args.format not in SUMMARY_WRITERS:
+            parser.error('summaries cannot be merged with --format '
+                         '{0}'.format(args.format))
+        return _merge_counts(counts, SUMMARY_WRITERS[args.format](sys.stdout))
+
+    # Chunks on which rules were skipped are not mistakes
+    num_errors = sum(v['rule'] != skipped_rule.id for v in violations)
+
+    writer = WRITERS[args.format](sys.stdout)
+    writer.begin()
+    for v in violations:
+        writer.violation(v['file'].encode('utf-8'), v['line'], '',
+                         (v['column'], v['end_column']), get_rule(v['rule']))
+    writer.end(num_errors)
+
+    totals = {}
+    for v in violations:
+        totals[v['rule']] = totals.get(v['rule'], 0) + 1
+    print >> sys.stderr, format_counts(totals)
+    return 1 if num_errors > 0 else 0
+
+
+def _merge_counts(counts, writer):
+    """Write the merged counts of summaries, returning the exit code."""
+    totals = {}
+    writer.begin()
+    for fname, file_counts in counts:
+        writer.counts(fname.encode('utf-8'), file_counts)
+        for rule_id, count in file_counts.items():
+            totals[rule_id] = totals.get(rule_id, 0) + count
+    num_errors = sum(count for rule_id, count in totals.items()
+                     if rule_id != skipped_rule.id)
+    writer.end(num_errors)
+
+    print >> sys.stderr, format_counts(totals)
+    return 1 if num_errors > 0 else 0
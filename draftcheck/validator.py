@@ -1,6 +1,8 @@
 """This modules contains code to find rule violations in text."""
 
 import rules
+import bisect
+import collections
 import itertools
 import re
 
@@ -12,6 +14,15 @@ LATEX_ENVS = {
 
 LATEX_ENVS = dict((k, env) for env in LATEX_ENVS for k in LATEX_ENVS[env])
 
+# Lines longer than this are validated in windows of this size, each seeing
+# this much of the line on either side of it. Only the rules whose matches are
+# no longer than the overlap are checked in windows, see `validate_windows`.
+WINDOW_SIZE = 1 << 13
+WINDOW_OVERLAP = 1 << 9
+
+# Characters of context kept on either side of violations on long lines
+EXCERPT_CONTEXT = 64
+
 
 class Validator(object):
     # Regular expressions to extract environments
@@ -19,9 +30,100 @@ class Validator(object):
     env_end_regex = re.compile(r'\\end{(\w+)}')
     math_env_regex = re.compile(r'((?:\$\$|\$|\\\[).+?(?:\$\$|\$|\\\]))')
 
-    def __init__(self):
+    # Used when validating whole documents, where environments are changed
+    # by lines starting with \begin or \end and inline maths may continue on
+    # the next line, but not past the end of a paragraph
+    env_line_regex = re.compile(r'^\\(begin|end){(\w+)}', re.M)
+    document_math_env_regex = re.compile(
+        r'((?:\$\$|\$|\\\[)(?:[^\n]|\n(?![ \t]*\n))+?(?:\$\$|\$|\\\]))')
+
+    def __init__(self, single_pass=False, envs=None, profile=None,
+                 max_chunk_length=None, lexer=False):
+        """Create a new validator.
+
+        Parameters
+        ----------
+        single_pass : boolean, optional
+            Whether to check all the rules at once using the combined matchers
+            of `scanner.Scanner` rather than scanning the text once per rule.
+            Both approaches find exactly the same violations. Defaults to
+            false.
+        envs : sequence of string, optional
+            The environment stack to start from, as given by `envs` of another
+            validator. Defaults to the top level of a document.
+        profile : profiling.RuleProfile, optional
+            If given, the time spent in each rule and the amount of text it
+            scanned are recorded in the profile. Rules are not timed
+            otherwise.
+        max_chunk_length : int, optional
+            If given, rules whose patterns may take time growing faster than
+            linearly with the length of the text are skipped on chunks of text
+            longer than this, and `rules.skipped_rule` is reported for those
+            chunks instead. See `guard.is_risky`.
+        lexer : boolean, optional
+            Whether to split the text with `lexer.lex`, tracking environments
+            wherever they begin and end and only checking the rules on text
+            and maths. Comments, verbatim text and the arguments of commands
+            such as `\\ref` are then left out. Defaults to false.
+        """
         # Initialise the environment stack
-        self._envs = ['paragraph']
+        self._envs = list(envs) if envs else ['paragraph']
+
+        self._scanner = None
+        if single_pass:
+            from scanner import Scanner
+            self._scanner = Scanner()
+        self._profile = profile
+        self.max_chunk_length = max_chunk_length
+        # Set while validating a long line in windows
+        self._window_overlap = None
+        self.lexer = lexer
+        if lexer:
+            # The patterns of the lexer are only compiled when it is used
+            from lexer import lex
+            self._lex = lex
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint, **kwargs):
+        """Create a validator to validate a document from a checkpoint.
+
+        Validating the lines from the offset of the checkpoint onwards finds
+        the same violations as validating the whole document from its start.
+        Other keyword arguments are passed on to the constructor.
+        """
+        return cls(envs=checkpoint.envs, **kwargs)
+
+    @property
+    def envs(self):
+        """The current environment stack, innermost environment last."""
+        return tuple(self._envs)
+
+    def reset(self, envs):
+        """Continue validating with the given environment stack."""
+        self._envs = list(envs)
+
+    def track(self, text, start=0, end=None):
+        """Follow the changes of environment in text[start:end].
+
+        No rules are checked: this only brings the environment stack to what
+        it would be after validating the lines, which must start at `start`,
+        much faster than validating them.
+        """
+        if end is None:
+            end = len(text)
+
+        if self.lexer:
+            # Lexing the lines changes the environment stack as it goes
+            for line in text[start:end].split('\n'):
+                for segment in self._lex(line, self._envs, LATEX_ENVS):
+                    pass
+            return
+
+        for match in Validator.env_line_regex.finditer(text, start, end):
+            if match.group(1) == 'begin':
+                self._envs.append(LATEX_ENVS.get(match.group(2), 'unknown'))
+            elif len(self._envs) > 1:
+                self._envs.pop()
 
     def validate(self, line):
         """Validate a particular line of text.
@@ -42,32 +144,424 @@ class Validator(object):
             is the tuple pair representing the start and end indices of the
             substring which violates that rule.
         """
-        # Check if the environment has changed
+        if self.lexer:
+            # The environment changes as the whole line is lexed
+            return self._check_segments(
+                line, list(self._lex(line, self._envs, LATEX_ENVS)))
+
+        self._change_env(line)
+        return self._check(line, Validator.math_env_regex)
+
+    def count(self, line, counts):
+        """Count the violations of each rule in a line.
+
+        The line is validated as by `validate`, but rather than yielding the
+        violations, the number of violations of each rule is added to
+        `counts`, indexed by rule id. The rules are called directly and no
+        records are built.
+        """
+        if self.lexer or self._profile is not None:
+            for rule, span in self.validate(line):
+                counts[rule.id] += 1
+            return
+
+        self._change_env(line)
+        for chunk, chunk_env in self._chunks(line, Validator.math_env_regex):
+            self._count_chunk(chunk, chunk_env, counts)
+
+    def validate_windows(self, pieces, overlap=WINDOW_OVERLAP):
+        """Validate a long line, given in consecutive pieces.
+
+        Each piece is checked along with `overlap` characters of the line on
+        either side of it, and only the violations starting within the piece
+        are reported, so that only a few pieces are held at any time and the
+        rules are never run over the whole line. Only the rules whose matches
+        are no longer than the overlap are checked, which find the violations
+        `validate` does, provided the inline maths around them is no longer
+        than the overlap. If any other rule applies, `rules.skipped_rule` is
+        reported once for the line, at its first piece.
+
+        Without `max_chunk_length`, no rule may be skipped, and with `lexer`
+        set, environments may change anywhere: the pieces are then joined
+        and validated as a whole.
+
+        Parameters
+        ----------
+        pieces : iterable of string
+            The line, in pieces at least `overlap` characters long except for
+            the last one.
+        overlap : int, optional
+            The number of characters of context on either side of a piece.
+
+        Yields
+        ------
+        rule, span, excerpt : (rule, (start, end), Excerpt)
+            The rule violated, the offsets of the violation in the line, and
+            the text of the line around it.
+        """
+        if self.lexer or self.max_chunk_length is None:
+            line = ''.join(pieces)
+            for rule, span in self.validate(line):
+                yield rule, span, Excerpt.around(line, span)
+            return
+
+        pieces = iter(pieces)
+        current = next(pieces, '')
+        self._change_env(current)
+
+        # The end of the line before the current piece, and its offset
+        before = ''
+        offset = 0
+        skipped = False
+        for following in itertools.chain(pieces, ['']):
+            text = before + current + following[:overlap]
+            base = offset - len(before)
+            for rule, span in self._check_window(text, overlap):
+                if rule is rules.skipped_rule:
+                    if not skipped:
+                        span = (len(before), len(before) + len(current))
+                        yield (rule, (offset, offset + len(current)),
+                               Excerpt.around(text, span, base))
+                    skipped = True
+                elif len(before) <= span[0] < len(before) + len(current):
+                    yield (rule, (span[0] + base, span[1] + base),
+                           Excerpt.around(text, span, base))
+
+            # The context of the next piece must not start within maths
+            end = len(before) + len(current)
+            cut = max(0, end - overlap)
+            for match in Validator.math_env_regex.finditer(text):
+                if match.end() <= cut:
+                    continue
+                if match.start() < cut:
+                    cut = match.end() if match.end() <= end else match.start()
+                break
+
+            before = text[cut:end]
+            offset += len(current)
+            current = following
+
+    def _check_window(self, text, overlap):
+        """Check a window of a long line, see `validate_windows`."""
+        self._window_overlap = overlap
+        try:
+            for violation in self._check(text, Validator.math_env_regex):
+                yield violation
+        finally:
+            self._window_overlap = None
+
+    def _change_env(self, line):
+        """Follow a change of environment at the start of a line."""
         match = Validator.env_begin_regex.match(line)
         if match:
             self._envs.append(LATEX_ENVS.get(match.group(1), 'unknown'))
 
         match = Validator.env_end_regex.match(line)
-        if match:
+        if match and len(self._envs) > 1:
             self._envs.pop()
 
+    def validate_document(self, text):
+        """Validate a whole document at once.
+
+        Rather than being fed line by line, the rules are run over each stretch
+        of the document between changes of environment. This finds violations
+        that span several lines, such as inline maths or duplicated words split
+        over a line break. As with `validate`, environments only change on
+        lines starting with `\\begin{...}` or `\\end{...}`.
+
+        Parameters
+        ----------
+        text : string or buffer
+            The contents of the document. Anything supporting the buffer
+            interface, such as a `mmap.mmap`, may be used.
+
+        Yields
+        ------
+        rule, span : (rule, (start, end))
+            The rule that is violated and the start and end offsets of the
+            offending substring in the document. Use `LineIndex` to turn the
+            offsets into line numbers and columns.
+        """
+        if self.lexer:
+            for violation in self._check_segments(
+                    text, self._lex(text, self._envs, LATEX_ENVS)):
+                yield violation
+            return
+
+        start = 0
+        for match in Validator.env_line_regex.finditer(text):
+            for violation in self._check_stretch(text, start, match.start()):
+                yield violation
+            start = match.start()
+
+            if match.group(1) == 'begin':
+                self._envs.append(LATEX_ENVS.get(match.group(2), 'unknown'))
+            elif len(self._envs) > 1:
+                self._envs.pop()
+
+        for violation in self._check_stretch(text, start, len(text)):
+            yield violation
+
+    def _check_stretch(self, text, start, end):
+        """Check text[start:end], reporting spans relative to `text`."""
+        if start == end:
+            return
+
+        for rule, span in self._check(text[start:end],
+                                      Validator.document_math_env_regex):
+            yield rule, (span[0] + start, span[1] + start)
+
+    def _check_segments(self, text, segments):
+        """Check the text and maths among segments of `text`.
+
+        Consecutive segments in the same environment are checked together as
+        one chunk, in which the arguments of commands are blanked out.
+        """
+        run = []
+        for segment in itertools.chain(segments, [None]):
+            if segment is not None and segment.kind == 'argument' and run:
+                run.append(segment)
+                continue
+
+            if segment is None or segment.kind in ('comment', 'verbatim'):
+                env = None
+            else:
+                env = segment.env
+
+            if run and env != run[0].env:
+                chunk = ''.join(' ' * (s.end - s.start)
+                                if s.kind == 'argument'
+                                else text[s.start:s.end] for s in run)
+                offset = run[0].start
+                for rule, span in self._check_chunk(chunk, run[0].env):
+                    yield rule, (span[0] + offset, span[1] + offset)
+                run = []
+
+            if env is not None:
+                run.append(segment)
+
+    def _chunks(self, text, math_env_regex):
+        """Return the (chunk, env) pairs of the text and inline maths."""
         # See if we need to extract inline math expressions
         if self._envs[-1] == 'math':
             # Because we are already in maths mode, there is no need to detect
             # nested math environments.
-            chunks = ['', line]
+            chunks = ['', text]
         else:
             # Split the text into chunks of text and inline maths
-            chunks = Validator.math_env_regex.split(line)
+            chunks = math_env_regex.split(text)
 
         # The chunks will alternate from text and maths
-        chunk_envs = itertools.cycle([self._envs[-1], 'math'])
+        return zip(chunks, itertools.cycle([self._envs[-1], 'math']))
 
+    def _check(self, text, math_env_regex):
+        """Check text in the current environment against the rules."""
         offset = 0
-        for chunk, chunk_env in zip(chunks, chunk_envs):
-            for rule in rules.RULES_LIST:
-                for span in rule(chunk, chunk_env):
-                    offsetted_span = (span[0] + offset, span[1] + offset)
-                    yield rule, offsetted_span
+        for chunk, chunk_env in self._chunks(text, math_env_regex):
+            for rule, span in self._check_chunk(chunk, chunk_env):
+                offsetted_span = (span[0] + offset, span[1] + offset)
+                yield rule, offsetted_span
 
             offset += len(chunk)
+
+    def _guard(self, chunk, env):
+        """Return the rules to check a chunk with, if some must be left out.
+
+        Returns None when all the rules that apply in `env` may be checked.
+        """
+        if self._window_overlap is not None:
+            # Leave out the rules which may match more than a window sees
+            from guard import windowed_rules_for_env
+            return windowed_rules_for_env(env, self._window_overlap)
+
+        if (self.max_chunk_length is not None and
+                len(chunk) > self.max_chunk_length):
+            # Leave out the rules which may be too slow on such long text
+            # Only needed for long chunks, and slow to import
+            from guard import guarded_rules_for_env
+            return guarded_rules_for_env(env)
+        return None
+
+    def _check_chunk(self, chunk, env):
+        """Check a chunk of text in a single environment against the rules."""
+        # Only go through the rules that apply in this environment
+        applicable = rules.rules_for_env(env)
+
+        guarded = self._guard(chunk, env)
+        if guarded is not None:
+            if len(guarded) < len(applicable):
+                yield rules.skipped_rule, (0, len(chunk))
+            applicable = guarded
+        elif self._scanner is not None and self._profile is None:
+            for violation in self._scanner.scan(chunk, env):
+                yield violation
+            return
+
+        if self._profile is not None:
+            for rule in applicable:
+                for span in self._profile.run(rule, chunk, env):
+                    yield rule, span
+            return
+
+        for rule in applicable:
+            for span in rule(chunk, env):
+                yield rule, span
+
+    def _count_chunk(self, chunk, env, counts):
+        """Count the violations `_check_chunk` finds in a chunk."""
+        applicable = rules.rules_for_env(env)
+
+        guarded = self._guard(chunk, env)
+        if guarded is not None:
+            if len(guarded) < len(applicable):
+                counts[rules.skipped_rule.id] += 1
+            applicable = guarded
+        elif self._scanner is not None:
+            for rule, span in self._scanner.scan(chunk, env):
+                counts[rule.id] += 1
+            return
+
+        # The rules for an environment all apply in it, so they do not need
+        # to be called through `Rule.__call__`
+        for rule in applicable:
+            counts[rule.id] += len(rule.func(chunk,
+                                             rule.regexpr.finditer(chunk)))
+
+
+class Excerpt(object):
+    """The text around a violation on a long line, indexed as the whole line.
+
+    Records of violations on lines validated in windows keep an excerpt
+    rather than the line, which is all reporting them needs. Slicing an
+    excerpt with offsets in the line gives the part of the slice it holds, and
+    its length is the offset of its end.
+
+    Parameters
+    ----------
+    text : string
+        The text of the excerpt.
+    start : int
+        The offset of the excerpt in the line.
+    """
+
+    def __init__(self, text, start):
+        self.text = text
+        self.start = start
+
+    @classmethod
+    def around(cls, text, span, offset=0, context=EXCERPT_CONTEXT):
+        """Return the excerpt of text at `offset` in a line around a span."""
+        start = max(0, span[0] - context)
+        return cls(text[start:span[1] + context], start + offset)
+
+    def __len__(self):
+        return self.start + len(self.text)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self.text[index - self.start]
+        start = index.start if index.start is not None else 0
+        stop = index.stop if index.stop is not None else len(self)
+        return self.text[max(0, start - self.start):max(0, stop - self.start)]
+
+    def strip(self):
+        return self
+
+    def __eq__(self, other):
+        return (isinstance(other, Excerpt) and
+                (self.text, self.start) == (other.text, other.start))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.text, self.start))
+
+    def __repr__(self):
+        return 'Excerpt({0!r}, {1})'.format(self.text, self.start)
+
+
+class Checkpoint(collections.namedtuple('Checkpoint', 'offset lineno envs')):
+    """The environment stack at the start of a line of a document.
+
+    Attributes
+    ----------
+    offset : int
+        The offset of the start of the line in the document.
+    lineno : int
+        The line number, counting from 0.
+    envs : tuple of string
+        The environment stack of a validator that has validated all the lines
+        before this one.
+    """
+    __slots__ = ()
+
+
+def find_checkpoints(text, chunk_size, lexer=False):
+    """Split a document into chunks of lines and find where each one starts.
+
+    This is a cheap pre-pass that only looks for lines beginning or ending
+    environments, as `Validator.validate` would, without checking any rules.
+    The chunks can then be validated independently, each with a validator
+    created by `Validator.from_checkpoint`.
+
+    Parameters
+    ----------
+    text : string or buffer
+        The contents of the document.
+    chunk_size : int
+        The approximate size of each chunk. Chunks always end at the end of a
+        line, so they may be longer.
+    lexer : boolean, optional
+        Whether the chunks are to be validated with `lexer` set, in which case
+        the lines are lexed to track the environments.
+
+    Returns
+    -------
+    checkpoints : list of Checkpoint
+        The checkpoints at the start of each chunk, the first one being at the
+        start of the document.
+    """
+    validator = Validator(lexer=lexer)
+
+    checkpoints = [Checkpoint(0, 0, validator.envs)]
+    while True:
+        offset = text.find('\n', checkpoints[-1].offset + chunk_size - 1) + 1
+        if offset <= 0 or offset >= len(text):
+            return checkpoints
+
+        # Apply the environment changes on the lines before the boundary
+        previous = checkpoints[-1]
+        validator.track(text, previous.offset, offset)
+
+        lineno = previous.lineno + text[previous.offset:offset].count('\n')
+        checkpoints.append(Checkpoint(offset, lineno, validator.envs))
+
+
+class LineIndex(object):
+    """Map offsets in a document to line numbers and columns.
+
+    Parameters
+    ----------
+    text : string or buffer
+        The contents of the document.
+    """
+    newline_regex = re.compile(r'\n')
+
+    def __init__(self, text):
+        # Offsets at which each line starts
+        self.starts = [0]
+        self.starts.extend(m.end() for m in
+                           LineIndex.newline_regex.finditer(text))
+        self.length = len(text)
+
+    def locate(self, offset):
+        """Return the (lineno, column) pair of an offset, counting from 0."""
+        lineno = bisect.bisect_right(self.starts, offset) - 1
+        return lineno, offset - self.starts[lineno]
+
+    def line_span(self, lineno):
+        """Return the start and end offsets of a line, with its newline."""
+        if lineno + 1 < len(self.starts):
+            return self.starts[lineno], self.starts[lineno + 1]
+        return self.starts[lineno], self.length
@@ -0,0 +1,186 @@
+"""This module contains code to check files again whenever they change."""
+
+import collections
+import os
+import sys
+import time
+
+from rules import get_brief, get_rule
+
+
+def _key(violation):
+    """Identify a violation independently of the line it is on."""
+    lineno, line, span, rule_id = violation
+    return line, span, rule_id
+
+
+def diff_violations(old, new):
+    """Compare the violations found in two versions of a file.
+
+    Violations are matched by their line, span and rule rather than by line
+    number, so that those on lines which merely moved are not reported.
+
+    Returns
+    -------
+    added, resolved : list of (lineno, line, span, rule_id)
+        The violations of `new` that are not in `old`, and those of `old` that
+        are not in `new`.
+    """
+    def unmatched(violations, others):
+        remaining = collections.Counter(_key(v) for v in others)
+        result = []
+        for violation in violations:
+            if remaining[_key(violation)] > 0:
+                remaining[_key(violation)] -= 1
+            else:
+                result.append(violation)
+        return result
+
+    return unmatched(new, old), unmatched(old, new)
+
+
+def format_change(sign, fname, violation):
+    lineno, line, span, rule_id = violation
+    rule = get_rule(rule_id)
+    return '{0} {1}:{2}:{3}: [{4:03d}] {5}\n'.format(
+        sign, fname, lineno, span[0], rule.id, get_brief(rule))
+
+
+class Watcher(object):
+    """Check the files in a directory again whenever they change.
+
+    Changes are found by polling the modification time and size of the
+    files. Directories are only listed again when their own modification
+    time changes, so that polling costs little more than a `stat` per file.
+    The process stays alive between changes, so the rules are compiled once.
+
+    Parameters
+    ----------
+    directory : string
+        The directory to watch, including its subdirectories.
+    check : callable
+        Called with the name of a file, returns the violations in the file as
+        `script.check_file` does.
+    interval : float, optional
+        The number of seconds to wait between polls.
+    stream : file, optional
+        The stream to report new and resolved violations to.
+    extensions : tuple of string, optional
+        The extensions of the files to watch.
+    cache : cache.Cache, optional
+        The cache `check` stores the violations in, if any. It is pruned
+        after each batch of changes, as a watch never ends.
+    """
+
+    def __init__(self, directory, check, interval=0.1, stream=sys.stdout,
+                 extensions=('.tex',), cache=None):
+        self.directory = directory
+        self.check = check
+        self.cache = cache
+        self.interval = interval
+        self.stream = stream
+        self.extensions = extensions
+
+        # Modification time and size, and violations, of each file
+        self.stats = {}
+        self.violations = {}
+
+        # Modification time, files and subdirectories of each directory
+        self._dirs = {}
+
+    def _scan(self, path, found):
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return
+
+        listing = self._dirs.get(path)
+        if listing is None or listing[0] != mtime:
+            files, subdirs = [], []
+            for name in sorted(os.listdir(path)):
+                if name.startswith('.'):
+                    continue
+                fname = os.path.join(path, name)
+                if os.path.isdir(fname):
+                    subdirs.append(fname)
+                elif name.endswith(self.extensions):
+                    files.append(fname)
+            listing = self._dirs[path] = (mtime, files, subdirs)
+
+        for fname in listing[1]:
+            try:
+                st = os.stat(fname)
+            except OSError:
+                continue
+            found[fname] = (st.st_mtime, st.st_size)
+        for subdir in listing[2]:
+            self._scan(subdir, found)
+
+    def poll(self):
+        """Return the names of the files changed, added or removed."""
+        found = {}
+        self._scan(self.directory, found)
+        changed = [fname for fname in sorted(found)
+                   if self.stats.get(fname) != found[fname]]
+        removed = sorted(set(self.stats) - set(found))
+        self.stats = found
+        return changed + removed
+
+    def update(self):
+        """Check the files that changed, reporting how their violations did.
+
+        Returns
+        -------
+        added, resolved : int
+            The numbers of violations added and resolved.
+        """
+        fnames = self.poll()
+        if not fnames:
+            return 0, 0
+
+        start = time.time()
+        num_added = num_resolved = 0
+        for fname in fnames:
+            if fname in self.stats:
+                try:
+                    violations = self.check(fname)
+                except IOError:
+                    # Forget the file, so that it is retried at the next poll
+                    del self.stats[fname]
+                    continue
+            else:
+                violations = []
+
+            added, resolved = diff_violations(
+                self.violations.get(fname, []), violations)
+            for violation in resolved:
+                self.stream.write(format_change('-', fname, violation))
+            for violation in added:
+                self.stream.write(format_change('+', fname, violation))
+            num_added += len(added)
+            num_resolved += len(resolved)
+
+            if violations:
+                self.violations[fname] = violations
+            else:
+                self.violations.pop(fname, None)
+
+        if self.cache is not None:
+            self.cache.prune()
+
+        self.stream.write(
+            '{0} new, {1} resolved in {2} file(s), {3:.0f} ms; {4} in '
+            'total\n'.format(num_added, num_resolved, len(fnames),
+                             (time.time() - start) * 1000,
+                             sum(len(v) for v in self.violations.values())))
+        self.stream.flush()
+        return num_added, num_resolved
+
+    def run(self):
+        """Watch the directory until interrupted."""
+        try:
+            while True:
+                self.update()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            return 0
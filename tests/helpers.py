@@ -0,0 +1,47 @@
+"""Helpers shared by the tests."""
+import contextlib
+import os
+import shutil
+import tempfile
+
+
+@contextlib.contextmanager
+def temp_dir():
+    """Make a temporary directory, removed with all it holds on exit."""
+    directory = tempfile.mkdtemp()
+    try:
+        yield directory
+    finally:
+        shutil.rmtree(directory)
+
+
+def write_file(directory, name, text):
+    """Write text to a file in a directory, returning the file name."""
+    fname = os.path.join(directory, name)
+    with open(fname, 'w') as outfile:
+        outfile.write(text)
+    return fname
+
+
+def run_main(argv):
+    """Run `draftcheck` with the given arguments.
+
+    Returns
+    -------
+    code : int
+        The exit code.
+    output : string
+        What was written to the standard output.
+    """
+    import sys
+    from cStringIO import StringIO
+    from draftcheck.script import main
+
+    saved = sys.argv, sys.stdout, sys.stderr
+    try:
+        sys.argv = ['draftcheck'] + argv
+        sys.stdout = StringIO()
+        sys.stderr = StringIO()
+        return main(), sys.stdout.getvalue()
+    finally:
+        sys.argv, sys.stdout, sys.stderr = saved
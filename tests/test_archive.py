@@ -0,0 +1,44 @@
+import os
+import tarfile
+import zipfile
+
+from cStringIO import StringIO
+
+from nose.tools import assert_equals
+from draftcheck.archive import check_archive, is_archive
+from draftcheck.script import check_lines, count_violations
+from draftcheck.validator import Validator
+from helpers import temp_dir
+
+MEMBERS = [('paper/main.tex', 'Some 15% text \\cite{a}.\n"Quoted"\n'),
+           ('paper/notes.txt', 'Some 15% text.\n'),
+           ('paper/sec/intro.tex', 'Wait ...\n')]
+
+
+def test_check_archive():
+    """Members are checked as the files would be once extracted."""
+    expected = [(name, check_lines(StringIO(text), Validator()))
+                for name, text in MEMBERS if name.endswith('.tex')]
+
+    with temp_dir() as directory:
+        fname = os.path.join(directory, 'paper.tar.gz')
+        with tarfile.open(fname, 'w:gz') as archive:
+            for name, text in MEMBERS:
+                info = tarfile.TarInfo(name)
+                info.size = len(text)
+                archive.addfile(info, StringIO(text))
+        assert is_archive(fname)
+        assert_equals(check_archive(fname),
+                      [(fname + '!' + name, violations)
+                       for name, violations in expected])
+
+        fname = os.path.join(directory, 'paper.zip')
+        with zipfile.ZipFile(fname, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, text in MEMBERS:
+                archive.writestr(name, text)
+        assert_equals(check_archive(fname),
+                      [(fname + '!' + name, violations)
+                       for name, violations in expected])
+        assert_equals(check_archive(fname, sink=count_violations)[0][1],
+                      check_lines(StringIO(MEMBERS[0][1]), Validator(),
+                                  sink=count_violations))
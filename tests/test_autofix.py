@@ -0,0 +1,42 @@
+import os
+
+from cStringIO import StringIO
+
+from nose.tools import assert_equals
+from draftcheck.autofix import apply_edits, find_edits, fix_file
+from draftcheck.validator import Validator
+from helpers import temp_dir, write_file
+
+
+def test_apply_edits():
+    """Overlapping edits are left out."""
+    edits = [(6, 9, 'X'), (0, 2, 'ab'), (1, 4, 'no'), (6, 7, 'Y')]
+    assert_equals(apply_edits('0123456789', edits), ('ab2345Y789', 2))
+
+
+def test_fix_file():
+    with temp_dir() as directory:
+        fname = write_file(directory, 'a.tex',
+                           'Some 15% text \\cite{a}...\n"Quoted"\n')
+        count, violations = fix_file(fname)
+        assert_equals(count, 3)
+        assert_equals([v[3] for v in violations], [13, 13])
+        with open(fname) as infile:
+            assert_equals(infile.read(),
+                          'Some 15\\% text~\\cite{a}\\ldots{}\n"Quoted"\n')
+
+        assert_equals(fix_file(fname)[0], 0)
+        assert_equals(os.listdir(directory), ['a.tex'])
+
+
+def test_find_edits():
+    """Only the violations that can be fixed safely are edited."""
+    text = ('Text  \\cite{a}, (\\ref{b}) and see~\\ref{c}.\n'
+            '\\textit{a} \\mathit{b} \\f{c} \\it{d} word\\cite{e}\n'
+            'Dr.Smith et. al.Jones\n')
+    edits, violations = find_edits(StringIO(text), Validator())
+    assert_equals(apply_edits(text, edits)[0],
+                  'Text  \\cite{a}, (\\ref{b}) and see~\\ref{c}.\n'
+                  '\\textit{a} \\mathit{b} \\f{c} \\textit{d} '
+                  'word~\\cite{e}\n'
+                  'Dr. Smith et al. Jones\n')
@@ -0,0 +1,26 @@
+from nose.tools import assert_equals
+from draftcheck.batch import validate_many
+from draftcheck.validator import Validator
+
+TEXTS = ['Some 15% text.', '', u'No mistakes here.', '"Quoted" and 20%',
+         'x < y']
+
+
+def test_validate_many():
+    """The results are those of a fresh validator for each document."""
+    expected = [(index, rule.id, span[0], span[1])
+                for index, text in enumerate(TEXTS)
+                for rule, span in Validator().validate_document(text)]
+    violations = validate_many(TEXTS)
+    assert_equals(list(violations), expected)
+    assert_equals(list(violations.document_counts(len(TEXTS))),
+                  [1, 0, 0, 3, 0])
+
+    counts = violations.rule_counts()
+    assert_equals((counts[6], counts[13]), (2, 2))
+    assert_equals(validate_many(TEXTS, counts_only=True), counts)
+
+
+def test_validate_many_envs():
+    assert_equals(list(validate_many(['<a, b>'], envs=['math'])),
+                  [(0, 19, 0, 6)])
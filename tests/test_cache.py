@@ -0,0 +1,50 @@
+import os
+
+from nose.tools import assert_equals
+from draftcheck.cache import Cache
+from helpers import temp_dir, write_file
+
+
+def test_roundtrip_and_prune():
+    with temp_dir() as path:
+        cache = Cache(path, max_size=0)
+        key = cache.key('Some text.\n', False)
+        assert key != cache.key('Some text.\n', True)
+        assert cache.get(key) is None
+
+        violations = [(0, 'Some text.', (4, 6), 12)]
+        cache.put(key, violations)
+        assert_equals(cache.get(key), violations)
+
+        cache.prune()
+        assert_equals(os.listdir(path), [])
+
+
+def test_check_file_memory_maps():
+    """Large files validated as a whole are memory-mapped, cached or not."""
+    import mmap
+    from draftcheck import script
+
+    threshold = script.MMAP_THRESHOLD
+    original = mmap.mmap
+    opened = []
+
+    def recording_mmap(*args, **kwargs):
+        opened.append(True)
+        return original(*args, **kwargs)
+
+    with temp_dir() as path:
+        fname = write_file(path, 'a.tex', 'Some 15% text.\n' * 10)
+        script.MMAP_THRESHOLD = 0
+        mmap.mmap = recording_mmap
+        try:
+            cache = Cache(os.path.join(path, 'cache'))
+            expected = script.check_file(fname, whole_document=True)
+            assert_equals(script.check_file(fname, whole_document=True,
+                                            cache=cache), expected)
+            assert_equals(script.check_file(fname, whole_document=True,
+                                            cache=cache), expected)
+            assert_equals(len(opened), 3)
+        finally:
+            mmap.mmap = original
+            script.MMAP_THRESHOLD = threshold
@@ -0,0 +1,78 @@
+import os
+
+from nose.tools import assert_equals
+from draftcheck.gitdiff import (changed_ranges, check_ranges, parse_diff,
+                                unquote_path)
+from draftcheck.script import check_file
+from helpers import temp_dir, write_file
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                       'simple.tex')
+
+DIFF = """diff --git a/doc.tex b/doc.tex
+--- a/doc.tex
++++ b/doc.tex
+@@ -3 +3 @@
+-old
++new
+@@ -10,0 +11,2 @@
+@@ -12,2 +13,0 @@
+@@ -20 +22,3 @@
+diff --git a/gone.tex b/gone.tex
+--- a/gone.tex
++++ /dev/null
+@@ -1 +0,0 @@
+"""
+
+
+def test_parse_diff():
+    assert_equals(parse_diff(DIFF), {'doc.tex': [(2, 3), (10, 12),
+                                                 (21, 24)]})
+
+
+def test_parse_diff_paths():
+    """Paths with spaces or special characters are read as git wrote them."""
+    diff = ('+++ b/a b.tex\t\n@@ -1 +1 @@\n'
+            '+++ "b/\\303\\251\\"q\\".tex"\n@@ -2 +2 @@\n')
+    assert_equals(parse_diff(diff), {'a b.tex': [(0, 1)],
+                                     '\xc3\xa9"q".tex': [(1, 2)]})
+    assert_equals(unquote_path('"a\\tb\\\\c"'), 'a\tb\\c')
+
+
+def test_check_ranges():
+    """Ranges are checked in the environment the whole file would be."""
+    ranges = [(20, 40), (90, 100)]
+    expected = [v for v in check_file(EXAMPLE)
+                if any(first <= v[0] < stop for first, stop in ranges)]
+    assert expected
+    assert_equals(check_ranges(EXAMPLE, ranges), expected)
+    assert_equals(check_ranges(EXAMPLE, ranges, lexer=True),
+                  [v for v in check_file(EXAMPLE, lexer=True)
+                   if any(first <= v[0] < stop for first, stop in ranges)])
+
+
+def test_changed_ranges():
+    """Files changed in the working tree are found relative to it."""
+    import subprocess
+
+    cwd = os.getcwd()
+    with temp_dir() as directory:
+        def git(*args):
+            subprocess.check_call(('git', '-c', 'user.name=a',
+                                   '-c', 'user.email=a@b') + args,
+                                  cwd=directory)
+
+        git('init', '-q')
+        write_file(directory, 'a b.tex', 'One.\nTwo.\nThree.\n')
+        write_file(directory, 'notes.txt', 'One.\n')
+        git('add', '.')
+        git('commit', '-q', '-m', 'first')
+        write_file(directory, 'a b.tex', 'One.\nTwo, 15%.\nThree.\nFour.\n')
+        write_file(directory, 'notes.txt', 'Two.\n')
+
+        os.chdir(directory)
+        try:
+            assert_equals(changed_ranges('HEAD').items(),
+                          [('a b.tex', [(1, 2), (3, 4)])])
+        finally:
+            os.chdir(cwd)
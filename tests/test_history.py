@@ -0,0 +1,32 @@
+import subprocess
+
+from nose.tools import assert_equals
+from draftcheck.history import history
+from helpers import temp_dir, write_file
+
+
+def test_history():
+    """Each distinct blob is checked once, whatever commits it is in."""
+    with temp_dir() as directory:
+        def git(*args):
+            subprocess.check_call(('git', '-c', 'user.name=a',
+                                   '-c', 'user.email=a@b') + args,
+                                  cwd=directory)
+
+        git('init', '-q')
+        write_file(directory, 'a.tex', 'Some 15% text.\n')
+        write_file(directory, 'notes.txt', 'Some 15% text.\n')
+        git('add', '.')
+        git('commit', '-q', '-m', 'first')
+        write_file(directory, 'b.tex', 'Some 15% text.\n')
+        git('add', '.')
+        git('commit', '-q', '-m', 'second')
+        write_file(directory, 'a.tex', 'Some 15% text, 20%.\n')
+        git('commit', '-q', '-a', '-m', 'third')
+
+        stats = {}
+        commits = list(history(directory, stats=stats))
+        assert_equals([(num_files, counts)
+                       for _, _, num_files, counts in commits],
+                      [(1, {6: 1}), (2, {6: 2}), (2, {6: 3})])
+        assert_equals(stats, {'checked': 2, 'cached': 0})
@@ -0,0 +1,48 @@
+from nose.tools import assert_equals
+from draftcheck.lexer import lex
+from draftcheck.validator import LATEX_ENVS, Validator
+
+
+def kinds(text, envs=None):
+    envs = envs if envs is not None else ['paragraph']
+    return [(s.kind, text[s.start:s.end]) for s in lex(text, envs, LATEX_ENVS)]
+
+
+def test_segments():
+    """Text, maths, comments and arguments are told apart."""
+    assert_equals(kinds(r'See~\ref{a-b} for $x$ % 1-2'),
+                  [('text', r'See~\ref{'), ('argument', 'a-b'),
+                   ('text', '} for '), ('math', '$x$'), ('text', ' '),
+                   ('comment', '% 1-2')])
+    assert_equals(kinds(r'Costs 15\% or 15% \(y\)'),
+                  [('text', r'Costs 15\% or 15% '), ('math', r'\(y\)')])
+
+
+def test_environments():
+    """Environments change anywhere on a line, and verbatim is left alone."""
+    envs = ['paragraph']
+    assert_equals(kinds(r'a \begin{equation} x \end{equation} b', envs),
+                  [('text', r'a \begin{equation}'), ('display', ' x '),
+                   ('text', r'\end{equation} b')])
+    assert_equals(envs, ['paragraph'])
+
+    assert_equals(kinds(r'\begin{verbatim} 15% $x$', envs),
+                  [('text', r'\begin{verbatim}'), ('verbatim', ' 15% $x$')])
+    assert_equals(envs, ['paragraph', 'verbatim'])
+    assert_equals(kinds(r'% $x$ \end{verbatim}', envs),
+                  [('verbatim', '% $x$ '), ('text', r'\end{verbatim}')])
+    assert_equals(envs, ['paragraph'])
+
+
+def test_maths_ends_with_paragraph():
+    assert_equals(kinds('a $b\nc\n\nd$'),
+                  [('text', 'a '), ('math', '$b\nc'), ('text', '\n\nd'),
+                   ('math', '$')])
+
+
+def test_validator_lexer():
+    """Rules are not run on comments, verbatim text or arguments."""
+    validator = Validator(lexer=True)
+    assert_equals(list(validator.validate(r'See~\ref{a-b}. % "quoted"')), [])
+    assert_equals([r.id for r, _ in validator.validate('"quoted" 15%')],
+                  [6, 13, 13])
@@ -0,0 +1,89 @@
+import json
+import sys
+from StringIO import StringIO
+
+from nose.tools import assert_equals
+from draftcheck.lsp import Document, LanguageServer
+
+TEXT = ('Water boils at 100%.\n'
+        '\\begin{equation}\n'
+        'x = sin(y)\n'
+        '\\end{equation}\n'
+        'See the the end.\n')
+
+
+def test_incremental_update():
+    """Edits give the same results as validating the edited text afresh."""
+    document = Document(TEXT)
+
+    # Editing a line within an environment only revalidates that line
+    assert_equals(document.update('cos', (2, 4), (2, 7)), 1)
+    text = TEXT.replace('sin', 'cos')
+    assert_equals(document.diagnostics(), Document(text).diagnostics())
+
+    # Removing the start of an environment revalidates the lines after it
+    assert document.update('', (1, 0), (2, 0)) > 1
+    text = text.replace('\\begin{equation}\n', '')
+    assert_equals(document.diagnostics(), Document(text).diagnostics())
+    assert_equals(document.lines, Document(text).lines)
+
+
+def run_session(messages, server=LanguageServer):
+    """Serve messages, returning the exit code and the replies."""
+    infile = StringIO(''.join(
+        'Content-Length: {0}\r\n\r\n{1}'.format(len(body), body)
+        for body in map(json.dumps, messages)))
+    outfile = StringIO()
+
+    code = server(infile, outfile).serve()
+    bodies = outfile.getvalue().split('Content-Length: ')[1:]
+    return code, [json.loads(body.split('\r\n\r\n', 1)[1])
+                  for body in bodies]
+
+
+def test_server_session():
+    messages = [
+        {'id': 1, 'method': 'initialize', 'params': {}},
+        {'method': 'textDocument/didOpen',
+         'params': {'textDocument': {'uri': 'file:///a.tex', 'text': TEXT}}},
+        {'id': 2, 'method': 'shutdown'},
+        {'method': 'exit'},
+    ]
+    code, replies = run_session(messages)
+    assert_equals(code, 0)
+    assert_equals(replies[1]['method'], 'textDocument/publishDiagnostics')
+    assert_equals(len(replies[1]['params']['diagnostics']), 3)
+
+
+def test_server_errors():
+    """Failing handlers do not stop the server."""
+    class Server(LanguageServer):
+        def on_fail(self, params):
+            raise ValueError('broken')
+
+    messages = [
+        {'method': 'textDocument/didChange',
+         'params': {'textDocument': {'uri': 'file:///unknown.tex'},
+                    'contentChanges': [{'text': 'x'}]}},
+        {'id': 1, 'method': 'fail'},
+        {'id': 2, 'method': 'shutdown'},
+        {'method': 'exit'},
+    ]
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+        code, replies = run_session(messages, Server)
+        assert 'didChange' in sys.stderr.getvalue()
+    finally:
+        sys.stderr = stderr
+
+    assert_equals(code, 0)
+    assert_equals([reply['id'] for reply in replies], [1, 2])
+    assert_equals(replies[0]['error']['code'], -32603)
+
+
+def test_document_options():
+    """Documents are validated with the options of the server."""
+    text = 'See~\\ref{fig:15%} here.\n'
+    assert Document(text).diagnostics()
+    assert_equals(Document(text, lexer=True).diagnostics(), [])
@@ -0,0 +1,69 @@
+import json
+from StringIO import StringIO
+
+from nose.tools import assert_equals
+from draftcheck.output import SUMMARY_WRITERS, WRITERS
+import draftcheck.rules as rules
+
+VIOLATIONS = [('a.tex', 3, 'It rose by 15% today.', (11, 14),
+               rules.check_unescaped_percentage),
+              ('a.tex', 5, 'Wait ...', (5, 8), rules.check_dot_dot_dot),
+              ('a.tex', 6, 'Quite  \\footnote{x}', (5, 16),
+               rules.check_space_before_footnote)]
+
+
+def report(fmt):
+    stream = StringIO()
+    writer = WRITERS[fmt](stream, buffer_size=10)
+    writer.begin()
+    for violation in VIOLATIONS:
+        writer.violation(*violation)
+    writer.end(len(VIOLATIONS))
+    return stream.getvalue()
+
+
+def test_human():
+    assert_equals(report('human'), (
+        "a.tex:3:11: ...t rose by 15% today.\n"
+        "                         ^^^\n"
+        "\t[006] Escape percentages with backslash.\n\n"
+        "a.tex:5:5: Wait ...\n"
+        "                ^^^\n"
+        "\t[012] Typeset ellipses by \\ldots, not '...'.\n\n"
+        "a.tex:6:5: Quite__\\footnote{x}\n"
+        "                ^^^^^^^^^^^\n"
+        "\t[001] Do not precede footnotes with spaces.\n\n"
+        "\nTotal of 3 mistakes found.\n"))
+
+
+def test_jsonl():
+    lines = report('jsonl').splitlines()
+    assert_equals(len(lines), 3)
+    assert_equals(json.loads(lines[0])['rule'], 6)
+    assert_equals(json.loads(lines[1])['column'], 5)
+
+
+def test_sarif():
+    log = json.loads(report('sarif'))
+    results = log['runs'][0]['results']
+    assert_equals([r['ruleId'] for r in results], ['006', '012', '001'])
+    assert_equals(results[0]['locations'][0]['physicalLocation']['region'],
+                  {'startLine': 4, 'startColumn': 12, 'endColumn': 15})
+
+
+def test_summary():
+    stream = StringIO()
+    writer = SUMMARY_WRITERS['jsonl'](stream)
+    writer.begin()
+    writer.counts('a.tex', {6: 2, 12: 1})
+    writer.end(3)
+    assert_equals(json.loads(stream.getvalue()),
+                  {'file': 'a.tex', 'counts': {'6': 2, '12': 1}, 'total': 3})
+
+
+def test_writer_kinds():
+    """Violation and summary writers each only take what they write."""
+    for writer in WRITERS.values():
+        assert not hasattr(writer, 'counts')
+    for writer in SUMMARY_WRITERS.values():
+        assert not hasattr(writer, 'violation')
@@ -0,0 +1,44 @@
+import os
+
+from nose.tools import assert_equals
+from draftcheck.project import Project
+from helpers import temp_dir, write_file
+
+FILES = {
+    'main.tex': ('\\begin{document}\n'
+                 '\\input{chapter}\n'
+                 '\\begin{equation}\n'
+                 '\\input{eq} % \\input{commented}\n'
+                 '\\end{equation}\n'
+                 '\\include{chapter}\n'
+                 '\\end{document}\n'),
+    'chapter.tex': '\\begin{itemize}\nText.\n',
+    'eq.tex': 'x = y\n',
+}
+
+
+def test_project():
+    with temp_dir() as base:
+        for name, text in FILES.items():
+            write_file(base, name, text)
+
+        project = Project([os.path.join(base, 'main.tex')])
+        path = lambda name: os.path.join(base, name)
+
+        assert_equals(list(project.files), [path('main.tex'),
+                                            path('chapter.tex'),
+                                            path('eq.tex')])
+        assert_equals(project.graph[path('main.tex')],
+                      [path('chapter.tex'), path('eq.tex')])
+        assert_equals(project.missing, [])
+
+        # Files start in the environment they are first included in
+        envs, resume = project.files[path('eq.tex')]
+        assert_equals(envs, ('paragraph', 'paragraph', 'unknown', 'math'))
+
+        # The environments opened by included files carry on after them
+        envs, resume = project.files[path('main.tex')]
+        assert_equals(envs, ('paragraph',))
+        assert_equals(resume[1], ('paragraph', 'paragraph', 'unknown'))
+        assert_equals(resume[5], ('paragraph', 'paragraph', 'unknown',
+                                  'unknown'))
@@ -28,3 +28,32 @@ def test_examples():
             text = normalise_text(match.group(2))
 
             yield assert_equals, found_error(rule, text), expected
+
+
+def test_dispatch_table():
+    """Every rule is dispatched exactly to the environments it applies in."""
+    for env in ['paragraph', 'math', 'unknown', 'tabular']:
+        expected = [r for r in rules.RULES_LIST if r.in_env in ('any', env)]
+        assert_equals(rules.rules_for_env(env), expected)
+
+
+def test_unknown_names():
+    assert_equals(rules.unknown_names(['6', '006', 'check_begin_center',
+                                       '999', 'check_typo']),
+                  ['999', 'check_typo'])
+
+
+def test_select_rules():
+    """Selecting rules by id or name narrows the rules dispatched."""
+    try:
+        rules.select_rules(select=['4', 'check_begin_center'])
+        assert_equals(sorted(r.id for r in rules.rules_for_env('paragraph')),
+                      [4, 15])
+
+        rules.select_rules(ignore=['004'])
+        assert 4 not in [r.id for r in rules.rules_for_env('paragraph')]
+    finally:
+        rules.select_rules()
+    assert_equals(len(rules.rules_for_env('paragraph')),
+                  len([r for r in rules.RULES_LIST
+                       if r.in_env in ('any', 'paragraph')]))
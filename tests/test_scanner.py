@@ -0,0 +1,33 @@
+import os
+
+from nose.tools import assert_equals
+from draftcheck.validator import Validator
+import draftcheck.rules as rules
+
+
+def violations(lines, single_pass):
+    validator = Validator(single_pass=single_pass)
+    return [(lineno, r.id, span) for lineno, line in enumerate(lines)
+            for r, span in validator.validate(line)]
+
+
+def test_examples_match_serial():
+    """The single pass engine reports the same violations as each rule."""
+    lines = [r.__doc__ for r in rules.RULES_LIST]
+    assert_equals(violations(lines, True), violations(lines, False))
+
+
+def test_overlapping_matches():
+    """Overlapping matches from different rules are all reported."""
+    lines = ['It rose by 15%... in 1st place, i.e. the the best $sin(x)$.\n']
+    result = violations(lines, True)
+    assert_equals(result, violations(lines, False))
+    assert len(result) > 4
+
+
+def test_example_document():
+    fname = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                         'simple.tex')
+    with open(fname) as infile:
+        lines = infile.readlines()
+    assert_equals(violations(lines, True), violations(lines, False))
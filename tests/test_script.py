@@ -0,0 +1,189 @@
+from cStringIO import StringIO
+
+from nose.tools import assert_equals, assert_raises
+from draftcheck.rules import RULES_LIST
+from draftcheck.script import check_lines, count_violations, validate_stream
+from draftcheck.validator import Validator
+import helpers
+from helpers import temp_dir, write_file
+
+
+def test_validate_stream():
+    """Streams of bytes or unicode give the records `check_lines` gives."""
+    text = 'A line with 15% in it.\n\\begin{equation}\n\\end{equation}\n'
+    expected = check_lines(text.splitlines(True), Validator())
+    assert expected
+
+    assert_equals(list(validate_stream(StringIO(text))), expected)
+    assert_equals(list(validate_stream(text.decode('utf-8').splitlines(True))),
+                  expected)
+
+
+def test_validate_stream_is_lazy():
+    """Violations are yielded before the rest of the stream is read."""
+    def lines():
+        yield 'A line with 15% in it.\n'
+        raise AssertionError('read too far')
+
+    lineno, line, span, rule_id = next(validate_stream(lines()))
+    assert_equals((lineno, line, rule_id), (0, 'A line with 15% in it.', 6))
+
+
+def test_validate_stream_long_lines():
+    """Long lines are validated in windows, finding the same violations."""
+    from draftcheck.guard import windowed_rules_for_env
+    from draftcheck.validator import WINDOW_OVERLAP
+
+    line = 'Costs 15% and $<a, b>$ or "this" e.g. here. ' * 1000 + '\n'
+    expected = [(span, rule.id) for rule, span in Validator().validate(line)]
+    records = list(validate_stream(StringIO(line)))
+    assert_equals(sorted((span, rule_id) for _, _, span, rule_id in records),
+                  sorted(expected))
+
+    # Only the rules whose matches fit in the overlap are checked in windows
+    windowed = set(r.id for env in ['paragraph', 'math']
+                   for r in windowed_rules_for_env(env, WINDOW_OVERLAP))
+    guarded = list(validate_stream(StringIO(line), max_chunk_length=10000))
+    assert_equals(guarded[0][3], 0)
+    assert_equals(sorted((span, rule_id)
+                         for _, _, span, rule_id in guarded[1:]),
+                  sorted(v for v in expected if v[1] in windowed))
+
+    # The records keep the text around each violation
+    lineno, excerpt, span, rule_id = records[-1]
+    assert_equals(excerpt[span[0]:span[1]], line[span[0]:span[1]])
+    assert_equals(len(excerpt), len(line))
+
+
+def test_count_violations():
+    """Counting finds as many violations of each rule as checking."""
+    text = ('A line with 15% in it, "quoted" e.g. here...\n'
+            '\\begin{equation}\nx = 15%\n\\end{equation}\n' +
+            'Costs 15% and $<a, b>$ or "this" e.g. here. ' * 300 + '\n')
+    for options in [{}, {'single_pass': True}, {'lexer': True},
+                    {'max_chunk_length': 100}]:
+        expected = [0] * (len(RULES_LIST) + 1)
+        for _, _, _, rule_id in check_lines(StringIO(text),
+                                            Validator(**options)):
+            expected[rule_id] += 1
+        counts = check_lines(StringIO(text), Validator(**options),
+                             sink=count_violations)
+        assert_equals(list(counts), expected)
+
+
+def run_main(args, files):
+    """Run `draftcheck` on files made from (name, text) pairs.
+
+    Returns
+    -------
+    code : int
+        The exit code.
+    output : string
+        What was written to the standard output.
+    """
+    with temp_dir() as directory:
+        fnames = [write_file(directory, name, text) for name, text in files]
+        return helpers.run_main(['--no-cache'] + args + fnames)
+
+
+def test_whole_document_long_stretches():
+    """No rules are skipped on long stretches of whole documents."""
+    files = [('a.tex', 'The price costs 15% more.\n' * 300)]
+    code, output = run_main(['--whole-document'], files)
+    assert_equals(code, 1)
+    assert_equals(output.count('[006]'), 300)
+
+
+def test_long_pathological_line():
+    """Slow rules are skipped on lines too long to check them quickly."""
+    import time
+
+    start = time.time()
+    code, output = run_main([], [('a.tex', 'a' * 200000 + '\n')])
+    assert time.time() - start < 5
+    assert_equals(code, 0)
+    assert_equals(output.count('[000]'), 1)
+
+
+def test_skipped_rules_are_not_mistakes():
+    files = [('a.tex', 'A clean sentence here.\n' * 800)]
+    code, output = run_main(['--whole-document', '--max-chunk-length',
+                             '1000'], files)
+    assert_equals(code, 0)
+    assert '[000]' in output
+    assert output.endswith('No mistakes found.\n')
+
+
+def test_apply_rule_options():
+    """Rule options on the command line take precedence over the config."""
+    import argparse
+    from draftcheck.rules import rules_for_env, select_rules
+    from draftcheck.script import add_rule_options, apply_rule_options
+
+    parser = argparse.ArgumentParser()
+    add_rule_options(parser)
+    with temp_dir() as directory:
+        config = write_file(directory, 'setup.cfg',
+                            '[draftcheck]\nselect = 4, 6\nignore = 6\n')
+        args = parser.parse_args(['--config', config, '--ignore', '4'])
+        try:
+            assert_equals(apply_rule_options(parser, args),
+                          (['4', '6'], ['4']))
+            assert_equals([r.id for r in rules_for_env('paragraph')], [6])
+        finally:
+            select_rules()
+
+
+def test_unknown_rules():
+    """Selecting rules which do not exist is an error, not a clean run."""
+    files = [('a.tex', 'Some 15% text.\n')]
+    assert_raises(SystemExit, run_main, ['--select', '999'], files)
+    assert_raises(SystemExit, run_main, ['--ignore', 'check_typo'], files)
+
+
+def test_watch_options():
+    """Options which watching would ignore are rejected."""
+    for args in [['--watch', '.'], ['--watch', '.', '--summary'],
+                 ['--watch', '.', '--format', 'jsonl']]:
+        assert_raises(SystemExit, run_main, args, [('a.tex', 'Text.\n')])
+
+
+def test_summary_chunks():
+    """Chunks of a file are counted together, unlike files given twice."""
+    import json
+    import draftcheck.script as script
+
+    text = 'Some 15% text.\n' * 100
+    chunk_size = script.CHUNK_SIZE
+    script.CHUNK_SIZE = 200
+    try:
+        code, output = run_main(['--summary', '--format', 'jsonl', '-j', '2'],
+                                [('a.tex', text), ('a.tex', text)])
+    finally:
+        script.CHUNK_SIZE = chunk_size
+    assert_equals(code, 1)
+    assert_equals([json.loads(line)['total'] for line in output.splitlines()],
+                  [100, 100])
+
+
+def test_jobs_match_serial():
+    """Checking files in parallel, in chunks, gives the serial output."""
+    import draftcheck.script as script
+
+    files = [('a.tex', 'Some 15% text.\n' * 20),
+             ('b.tex', ('Text "here".\n\\begin{equation}\nx = 15%\n'
+                        '\\end{equation}\nCosts 15%.\n') * 40),
+             ('c.tex', 'A clean sentence.\n')]
+    chunk_size = script.CHUNK_SIZE
+    script.CHUNK_SIZE = 200
+    try:
+        with temp_dir() as directory:
+            fnames = [write_file(directory, name, text)
+                      for name, text in files]
+            for args in [[], ['--format', 'jsonl'], ['--summary']]:
+                args = ['--no-cache'] + args + fnames
+                serial = helpers.run_main(args)
+                assert serial[1]
+                assert_equals(helpers.run_main(['-j', '2'] + args), serial)
+    finally:
+        script.CHUNK_SIZE = chunk_size
@@ -0,0 +1,66 @@
+import json
+
+from nose.tools import assert_equals
+from draftcheck.service import Stats, check_text
+
+
+def test_check_text():
+    violations = check_text((u'Some 15% here.\n', False, {}))
+    assert_equals([(v['line'], v['column'], v['rule']) for v in violations],
+                  [(0, 5, 6)])
+    assert_equals(check_text(('Some text.', True, {'lexer': True})), [])
+
+
+def test_backpressure():
+    """Documents are turned away once too many are pending."""
+    stats = Stats()
+    assert stats.acquire(5, 4)
+    assert not stats.acquire(1, 4)
+    stats.release(5, 2, 0.01)
+    assert stats.acquire(1, 4)
+
+    counters = stats.as_dict()
+    assert_equals((counters['documents'], counters['violations'],
+                   counters['rejected'], counters['pending']), (5, 2, 1, 1))
+    assert_equals(counters['latency_ms']['max'], 10)
+
+
+class BrokenService(object):
+    """A service whose workers fail on every document."""
+
+    def check(self, texts, whole_document=False):
+        raise RuntimeError('worker died')
+
+
+def post(service, bodies):
+    """Send requests to a server for a service, returning its replies."""
+    import httplib
+    import threading
+    from draftcheck.service import Handler, HTTPServer
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        replies = []
+        for body in bodies:
+            connection = httplib.HTTPConnection(*server.server_address)
+            connection.request('POST', '/check', json.dumps(body))
+            response = connection.getresponse()
+            replies.append((response.status, json.loads(response.read())))
+        return replies
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_bad_requests():
+    """Requests are answered with an error rather than dropped."""
+    replies = post(BrokenService(), [
+        {'text': None}, {'text': 5},
+        {'documents': [{'text': 'a'}, {'text': []}]},
+        {'text': 'Some text.'}])
+    assert_equals([status for status, _ in replies], [400, 400, 400, 500])
+    assert 'worker died' in replies[-1][1]['error']
@@ -0,0 +1,98 @@
+import json
+
+from nose.tools import assert_equals, assert_raises
+from draftcheck.shard import parse_shard, read_reports, shard_files
+from helpers import run_main, temp_dir, write_file
+
+
+def test_parse_shard():
+    assert_equals(parse_shard('2/3'), (2, 3))
+    for text in ['0/3', '4/3', '1', 'a/b']:
+        assert_raises(ValueError, parse_shard, text)
+
+
+def test_shard_files():
+    """Shards split the files between them, balanced by size."""
+    import os
+
+    with temp_dir() as directory:
+        fnames = [write_file(directory, '{0}.tex'.format(i), 'x' * size)
+                  for i, size in enumerate([50, 40, 30, 20, 10, 10])]
+        shards = [shard_files(fnames, index, 2) for index in [1, 2]]
+        assert_equals(sorted(shards[0] + shards[1]), fnames)
+        assert_equals([sum(os.path.getsize(fname) for fname in shard)
+                       for shard in shards], [80, 80])
+        assert_equals(shard_files(fnames[::-1], 1, 2), shards[0][::-1])
+
+
+def write_reports(directory, reports):
+    """Write reports made of lists of records, returning their names."""
+    return [write_file(directory, '{0}.jsonl'.format(i),
+                       ''.join(json.dumps(record) + '\n'
+                               for record in report))
+            for i, report in enumerate(reports)]
+
+
+def test_read_reports():
+    """Violations of every report are merged in order."""
+    with temp_dir() as directory:
+        reports = [
+            [{'file': 'b.tex', 'line': 1, 'column': 3, 'end_column': 4,
+              'rule': 6}],
+            [{'file': 'a.tex', 'line': 2, 'column': 0, 'end_column': 1,
+              'rule': 1},
+             {'file': 'b.tex', 'line': 0, 'column': 5, 'end_column': 7,
+              'rule': 13}],
+        ]
+        violations, counts = read_reports(write_reports(directory, reports))
+        assert_equals(counts, [])
+        assert_equals([(v['file'], v['line']) for v in violations],
+                      [('a.tex', 2), ('b.tex', 0), ('b.tex', 1)])
+
+
+def test_read_summaries():
+    """The counts of summaries are added up by file."""
+    with temp_dir() as directory:
+        fnames = write_reports(directory, [
+            [{'file': 'b.tex', 'counts': {'6': 2}, 'total': 2}],
+            [{'file': 'a.tex', 'counts': {}, 'total': 0},
+             {'file': 'b.tex', 'counts': {'6': 1, '13': 1}, 'total': 2}],
+        ])
+        assert_equals(read_reports(fnames),
+                      ([], [('a.tex', {}), ('b.tex', {6: 3, 13: 1})]))
+
+
+def test_read_reports_errors():
+    """Records of unknown shapes, and mixed reports, are rejected."""
+    with temp_dir() as directory:
+        violation = {'file': 'a.tex', 'line': 0, 'column': 0,
+                     'end_column': 1, 'rule': 6}
+        counts = {'file': 'a.tex', 'counts': {'6': 1}, 'total': 1}
+        for reports in [[['text']], [[{'file': 'a.tex', 'line': 0}]],
+                        [[dict(violation, rule=999)]],
+                        [[dict(counts, counts={'x': 1})]],
+                        [[violation], [counts]]]:
+            assert_raises(ValueError, read_reports,
+                          write_reports(directory, reports))
+
+
+def test_merge_shards():
+    """Merging the reports of every shard gives the report of one run."""
+    with temp_dir() as directory:
+        fnames = [write_file(directory, '{0}.tex'.format(i), text)
+                  for i, text in enumerate([
+                      'Some 15% text.\n' * 3, 'Text "here" e.g. now.\n',
+                      'A clean sentence.\n', 'Costs 15%.\n' * 5])]
+        for args in [['--format', 'jsonl'],
+                     ['--format', 'jsonl', '--summary']]:
+            args = ['--no-cache'] + args
+            expected = run_main(args + fnames)
+            reports = []
+            for shard in ['1/2', '2/2']:
+                code, output = run_main(args + ['--shard', shard] + fnames)
+                assert output
+                reports.append(write_file(
+                    directory, 'shard{0}.jsonl'.format(len(reports)),
+                    output))
+            assert_equals(run_main(['merge', '--format', 'jsonl'] + reports),
+                          expected)
@@ -0,0 +1,141 @@
+from nose.tools import assert_equals
+from draftcheck.validator import LineIndex, Validator, find_checkpoints
+import draftcheck.rules as rules
+from draftcheck.profiling import RuleProfile
+
+
+def test_line_index():
+    index = LineIndex('ab\ncd\n\nef')
+    assert_equals(index.locate(0), (0, 0))
+    assert_equals(index.locate(4), (1, 1))
+    assert_equals(index.locate(6), (2, 0))
+    assert_equals(index.locate(8), (3, 1))
+    assert_equals(index.line_span(1), (3, 6))
+    assert_equals(index.line_span(3), (7, 9))
+
+
+def test_document_matches_lines():
+    """Violations within single lines are found by both entry points."""
+    text = ('Water boils at 100%.\n'
+            '\\begin{equation}\n'
+            'x = sin(y)\n'
+            '\\end{equation}\n'
+            'See Figure \\ref{fig}.\n')
+
+    validator = Validator()
+    by_line = []
+    offset = 0
+    for line in text.splitlines(True):
+        by_line.extend((r.id, (s + offset, e + offset))
+                       for r, (s, e) in validator.validate(line))
+        offset += len(line)
+
+    by_document = [(r.id, span) for r, span in
+                   Validator().validate_document(text)]
+    assert_equals(sorted(by_document), sorted(by_line))
+
+
+def test_document_across_lines():
+    """Duplicated words and inline maths may span several lines."""
+    found = set(r.id for r, _ in
+                Validator().validate_document('It is the\nthe $x +\nsin y$.'))
+    assert rules.check_duplicate_word.id in found
+    assert rules.check_unescaped_named_math_operators.id in found
+
+
+def test_checkpoints():
+    """Validating from checkpoints gives the same results as a serial run."""
+    text = ('Water boils at 100%.\n'
+            '\\begin{equation}\n'
+            'x = sin(y)\n'
+            'y = cos(x)\n'
+            '\\end{equation}\n'
+            'See the the end.\n') * 5
+    lines = text.splitlines(True)
+
+    validator = Validator()
+    serial = [(lineno, r.id, span) for lineno, line in enumerate(lines)
+              for r, span in validator.validate(line)]
+
+    checkpoints = find_checkpoints(text, 30)
+    assert len(checkpoints) > 5
+
+    starts = [c.lineno for c in checkpoints] + [len(lines)]
+    chunked = []
+    for checkpoint, end in zip(checkpoints, starts[1:]):
+        assert text[:checkpoint.offset].count('\n') == checkpoint.lineno
+        validator = Validator.from_checkpoint(checkpoint)
+        for lineno in range(checkpoint.lineno, end):
+            chunked.extend((lineno, r.id, span)
+                           for r, span in validator.validate(lines[lineno]))
+    assert_equals(chunked, serial)
+
+
+def test_profile():
+    """Profiling records every rule that is run without changing results."""
+    profile = RuleProfile()
+    text = 'It rose by 15% in $sin(x)$.\n'
+    found = list(Validator(profile=profile).validate(text))
+    assert_equals(found, list(Validator().validate(text)))
+
+    assert_equals(sum(stats[4] for stats in profile.stats.values()),
+                  len(found))
+    assert_equals(profile.stats[rules.check_unescaped_percentage.id][1:4],
+                  [2, 2, len(text) - len('$sin(x)$')])
+
+
+def test_max_chunk_length():
+    """Rules that may be slow are skipped on long chunks of text."""
+    text = 'See~\\cite{a}\\cite{b}. It rose by 15%.'
+    found = [r for r, _ in Validator(max_chunk_length=10).validate(text)]
+    assert_equals(found[0], rules.skipped_rule)
+    assert rules.check_multiple_cite not in found
+    assert rules.check_unescaped_percentage not in found
+    assert rules.check_no_space_before_cite in found
+
+    found = [r for r, _ in Validator(max_chunk_length=100).validate(text)]
+    assert rules.skipped_rule not in found
+    assert rules.check_multiple_cite in found
+
+
+def test_windows_long_matches():
+    """Matches across windows are found, or the rules left out reported."""
+    from draftcheck.validator import WINDOW_OVERLAP, WINDOW_SIZE
+
+    footnote = '\\footnote{' + 'x' * (2 * WINDOW_OVERLAP) + '}.'
+    line = (('Some words. ' * WINDOW_SIZE)[:WINDOW_SIZE - WINDOW_OVERLAP] +
+            footnote + ' See \\centerline{b}\n')
+    pieces = [line[i:i + WINDOW_SIZE]
+              for i in xrange(0, len(line), WINDOW_SIZE)]
+
+    found = [(r, span) for r, span, _ in
+             Validator().validate_windows(pieces)]
+    assert_equals(found, list(Validator().validate(line)))
+    assert rules.check_footnote_before_punctuation in [r for r, _ in found]
+
+    found = [(r, span) for r, span, _ in
+             Validator(max_chunk_length=10000).validate_windows(pieces)]
+    assert_equals(found[0], (rules.skipped_rule, (0, WINDOW_SIZE)))
+    assert rules.check_footnote_before_punctuation not in [r for r, _ in found]
+    assert_equals([r.name for r, _ in found[1:]], ['check_obsolete_commands'])
+
+
+def test_count():
+    """Counting finds as many violations of each rule as validating."""
+    lines = ['A line with 15% in it, "quoted" e.g. here...',
+             '\\begin{equation}', 'x = 15%', '\\end{equation}',
+             'Costs 15% and $<a, b>$ or "this" e.g. here. ' * 30]
+    for options in [{}, {'single_pass': True}, {'lexer': True},
+                    {'max_chunk_length': 100}]:
+        expected = [0] * (len(rules.RULES_LIST) + 1)
+        validator = Validator(**options)
+        for line in lines:
+            for rule, _ in validator.validate(line):
+                expected[rule.id] += 1
+
+        counts = [0] * (len(rules.RULES_LIST) + 1)
+        validator = Validator(**options)
+        for line in lines:
+            validator.count(line, counts)
+        assert_equals(counts, expected)
+        assert counts[rules.check_unescaped_percentage.id] > 0
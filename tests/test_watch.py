@@ -0,0 +1,71 @@
+import os
+
+from cStringIO import StringIO
+
+from nose.tools import assert_equals
+from draftcheck.script import check_file
+from draftcheck.watch import Watcher, diff_violations
+from helpers import temp_dir, write_file
+
+
+def test_diff_violations():
+    """Violations on lines that moved are neither added nor resolved."""
+    old = [(0, 'a', (0, 1), 6), (2, 'b', (0, 1), 6)]
+    new = [(1, 'a', (0, 1), 6), (3, 'c', (0, 1), 13)]
+    assert_equals(diff_violations(old, new),
+                  ([(3, 'c', (0, 1), 13)], [(2, 'b', (0, 1), 6)]))
+
+
+def test_watcher():
+    """Only files that changed are checked again."""
+    with temp_dir() as directory:
+        fname = write_file(directory, 'a.tex', 'Some 15% here.\n')
+        checked = []
+
+        def check(fname):
+            checked.append(fname)
+            return check_file(fname)
+
+        watcher = Watcher(directory, check, stream=StringIO())
+        assert_equals(watcher.update(), (1, 0))
+        assert_equals(watcher.update(), (0, 0))
+        assert_equals(checked, [fname])
+
+        write_file(directory, 'a.tex', 'Some more text\nand "more" here.\n')
+        os.utime(fname, (0, 0))
+        assert_equals(watcher.update(), (2, 1))
+
+        os.remove(fname)
+        assert_equals(watcher.update(), (0, 2))
+        assert_equals(watcher.violations, {})
+
+
+def test_watcher_retries_unreadable_files():
+    """Files that could not be read are checked again at the next poll."""
+    with temp_dir() as directory:
+        write_file(directory, 'a.tex', 'Some 15% here.\n')
+        failures = [IOError('busy')]
+
+        def check(fname):
+            if failures:
+                raise failures.pop()
+            return check_file(fname)
+
+        watcher = Watcher(directory, check, stream=StringIO())
+        assert_equals(watcher.update(), (0, 0))
+        assert_equals(watcher.update(), (1, 0))
+
+
+def test_watcher_prunes_cache():
+    """The cache is pruned after each batch of changes."""
+    import functools
+    from draftcheck.cache import Cache
+
+    with temp_dir() as directory:
+        write_file(directory, 'a.tex', 'Some 15% here.\n')
+        cache = Cache(os.path.join(directory, '.cache'), max_size=0)
+        watcher = Watcher(directory, functools.partial(check_file,
+                                                       cache=cache),
+                          stream=StringIO(), cache=cache)
+        assert_equals(watcher.update(), (1, 0))
+        assert_equals(os.listdir(cache.path), [])